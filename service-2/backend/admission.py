@@ -0,0 +1,227 @@
+import math
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+import soundfile as sf
+from fastapi import HTTPException
+
+logger = logging.getLogger("mutrapro")
+
+# bounds of the Retry-After estimate, in seconds
+RETRY_AFTER_MIN = 1
+RETRY_AFTER_MAX = 300
+# wall seconds per audio second assumed until the first transcriptions finished
+INITIAL_SECONDS_PER_AUDIO_SECOND = 0.25
+# scheduling lanes: short clips (fast) and everything else (long)
+FAST_LANE = "fast"
+LONG_LANE = "long"
+# a waiting long request is due this many seconds per audio second after it arrived
+LONG_WAIT_PER_AUDIO_SECOND = 0.5
+
+
+class Overloaded(HTTPException):
+    """Request shed by admission control; carries a Retry-After header."""
+
+    def __init__(self, status_code: int, reason: str, detail: str, retry_after: int):
+        super().__init__(status_code=status_code, detail=detail, headers={"Retry-After": str(retry_after)})
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def audio_seconds(path: str) -> float:
+    """Duration from the file header, without decoding; 0 when unknown. Runs in a thread."""
+    try:
+        return float(sf.info(path).duration)
+    except (RuntimeError, sf.LibsndfileError, OSError):
+        return 0.0
+
+
+class AdmissionController:
+    """Bounded concurrency for transcriptions with a bounded, duration-aware wait queue.
+
+    At most ``max_concurrent`` transcriptions run. Requests for up to
+    ``fast_seconds`` of audio use the fast lane: they may take any free slot
+    and are always served before long ones, while long requests never hold
+    more than ``max_concurrent - fast_slots`` slots, so ``fast_slots`` stay
+    reserved for short clips. Waiting long requests are served earliest
+    deadline first, the deadline being their arrival plus
+    LONG_WAIT_PER_AUDIO_SECOND per second of audio: shorter work goes first,
+    but nothing waits forever behind a stream of smaller jobs.
+
+    A request is shed instead of queued when ``max_queue`` requests already
+    wait in its lane or the queued audio would exceed ``max_queued_audio``
+    seconds (429), or when it waited longer than ``queue_timeout`` seconds
+    (503). 0 disables the audio and timeout limits. Callers that must not be
+    shed (durable jobs) pass ``shed=False``: they wait as long as needed.
+    ``on_reject(reason)`` is called for every shed request (metrics).
+
+    Work split into pool tasks (SSE and WebSocket blocks) takes one slot per
+    running block, in the lane of the whole recording (``lane=``), so a slot
+    always stands for one busy worker.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, max_queued_audio: float = 0,
+                 queue_timeout: float = 0, fast_seconds: float = 0, fast_slots: int = 0, on_reject=None):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.max_queued_audio = max_queued_audio
+        self.queue_timeout = queue_timeout
+        self.fast_seconds = fast_seconds
+        # a single slot cannot be reserved: long requests would never run
+        self.long_limit = max(1, self.max_concurrent - max(0, fast_slots))
+        self.on_reject = on_reject
+        self.active = {FAST_LANE: 0, LONG_LANE: 0}
+        self.active_audio = 0.0
+        self.queued_audio = 0.0
+        self.admitted = {FAST_LANE: 0, LONG_LANE: 0}
+        self.rejected = {"queue_full": 0, "audio_limit": 0, "timeout": 0}
+        self._waiters = []  # [future, audio seconds, lane, deadline]
+        # moving average of wall seconds per audio second, for Retry-After
+        self._cost = INITIAL_SECONDS_PER_AUDIO_SECOND
+
+    def lane(self, audio: float) -> str:
+        return FAST_LANE if audio <= self.fast_seconds else LONG_LANE
+
+    def lane_slots(self, audio: float) -> int:
+        """Most slots (workers) requests of this length may occupy at once."""
+        return self.max_concurrent if self.lane(audio) == FAST_LANE else self.long_limit
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _queued_in(self, lane: str) -> int:
+        return sum(1 for w in self._waiters if w[2] == lane)
+
+    def _can_run(self, lane: str) -> bool:
+        if sum(self.active.values()) >= self.max_concurrent:
+            return False
+        return lane == FAST_LANE or self.active[LONG_LANE] < self.long_limit
+
+    @property
+    def saturated(self) -> bool:
+        """True while new long requests would be rejected outright."""
+        return not self._can_run(LONG_LANE) and (
+            self._queued_in(LONG_LANE) >= self.max_queue
+            or bool(self.max_queued_audio and self.queued and self.queued_audio >= self.max_queued_audio))
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog has probably drained."""
+        backlog = (self.active_audio + self.queued_audio) * self._cost / self.max_concurrent
+        return int(min(RETRY_AFTER_MAX, max(RETRY_AFTER_MIN, math.ceil(backlog))))
+
+    def check(self, audio: float = 0.0, lane: str = None) -> None:
+        """Raise Overloaded if a sheddable request for ``audio`` seconds would be rejected right now."""
+        lane = lane or self.lane(audio)
+        if self._can_run(lane):
+            return
+        if self._queued_in(lane) >= self.max_queue:
+            self._reject("queue_full", 429, "Too many transcriptions waiting; retry later")
+        if self.max_queued_audio and self._waiters and self.queued_audio + audio > self.max_queued_audio:
+            self._reject("audio_limit", 429, "Too much audio waiting to be transcribed; retry later")
+
+    def _reject(self, reason: str, status_code: int, detail: str):
+        self.rejected[reason] += 1
+        if self.on_reject is not None:
+            self.on_reject(reason)
+        retry_after = self.retry_after()
+        logger.info("Shedding transcription (%s, active %d, queued %d, %.0f s audio queued); retry after %d s",
+                    reason, sum(self.active.values()), self.queued, self.queued_audio, retry_after)
+        raise Overloaded(status_code, reason, detail, retry_after)
+
+    async def acquire(self, audio: float = 0.0, shed: bool = True, lane: str = None) -> None:
+        """Take a slot in ``lane`` (by default the lane of ``audio`` seconds)."""
+        lane = lane or self.lane(audio)
+        # nobody eligible is ever left waiting (see _dispatch), so a free slot is ours
+        if self._can_run(lane):
+            self._grant(lane, audio)
+            return
+        if shed:
+            self.check(audio, lane)
+        fut = asyncio.get_running_loop().create_future()
+        wait = 0.0 if lane == FAST_LANE else audio * LONG_WAIT_PER_AUDIO_SECOND
+        entry = [fut, audio, lane, time.monotonic() + wait]
+        self._waiters.append(entry)
+        self.queued_audio += audio
+        timeout = self.queue_timeout if shed and self.queue_timeout > 0 else None
+        try:
+            await asyncio.wait_for(fut, timeout)
+        except BaseException as e:
+            if fut.done() and not fut.cancelled():
+                # the slot was handed over just as we gave up: pass it on
+                self.release(audio, None, lane)
+            else:
+                self._remove(entry)
+            if isinstance(e, asyncio.TimeoutError):
+                self._reject("timeout", 503, f"Waited more than {self.queue_timeout:g} s for a free worker")
+            raise
+
+    def _grant(self, lane: str, audio: float) -> None:
+        self.active[lane] += 1
+        self.active_audio += audio
+        self.admitted[lane] += 1
+
+    def _remove(self, entry) -> None:
+        try:
+            self._waiters.remove(entry)
+        except ValueError:
+            return
+        self.queued_audio -= entry[1]
+
+    def _dispatch(self) -> None:
+        # hand free slots to the best eligible waiters: fast lane first, then earliest deadline
+        while self._waiters:
+            eligible = [w for w in self._waiters if not w[0].done() and self._can_run(w[2])]
+            if not eligible:
+                break
+            entry = min(eligible, key=lambda w: (w[2] != FAST_LANE, w[3]))
+            self._waiters.remove(entry)
+            self.queued_audio -= entry[1]
+            self._grant(entry[2], entry[1])
+            entry[0].set_result(None)
+        if not self._waiters:
+            self.queued_audio = 0.0
+
+    def release(self, audio: float = 0.0, elapsed: float = None, lane: str = None) -> None:
+        """Free a slot; ``elapsed`` wall seconds of a finished transcription refine Retry-After."""
+        if elapsed is not None and audio > 0:
+            self._cost = 0.8 * self._cost + 0.2 * (elapsed / audio)
+        self.active[lane or self.lane(audio)] -= 1
+        self.active_audio -= audio
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, audio: float = 0.0, shed: bool = True, lane: str = None):
+        """Hold a transcription slot for the enclosed block."""
+        await self.acquire(audio, shed, lane)
+        started = time.perf_counter()
+        elapsed = None
+        try:
+            yield
+            elapsed = time.perf_counter() - started
+        finally:
+            self.release(audio, elapsed, lane)
+
+    def stats(self) -> dict:
+        return {
+            "active": sum(self.active.values()),
+            "max_concurrent": self.max_concurrent,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "lanes": {
+                FAST_LANE: {"max_audio_seconds": self.fast_seconds, "active": self.active[FAST_LANE],
+                            "queued": self._queued_in(FAST_LANE), "admitted": self.admitted[FAST_LANE],
+                            "reserved_slots": self.max_concurrent - self.long_limit},
+                LONG_LANE: {"active": self.active[LONG_LANE], "queued": self._queued_in(LONG_LANE),
+                            "admitted": self.admitted[LONG_LANE], "max_concurrent": self.long_limit},
+            },
+            "queued_audio_seconds": round(self.queued_audio, 3),
+            "max_queued_audio_seconds": self.max_queued_audio,
+            "active_audio_seconds": round(self.active_audio, 3),
+            "saturated": self.saturated,
+            "retry_after": self.retry_after(),
+            "admitted": sum(self.admitted.values()),
+            "rejected": dict(self.rejected),
+        }
@@ -0,0 +1,124 @@
+"""Accuracy vs speed of the pitch engines in processing.PITCH_ENGINES on synthetic melodies.
+
+Run from service-2/backend:  python benchmarks/bench_engines.py [--seconds 30] [--output report.md]
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from processing import (PITCH_ENGINES, get_pitch_engine, processing_params,  # noqa: E402
+                        quantize_pitch, segment_notes)
+
+SR = 22050
+
+
+def synthetic_melody(seconds, rng, harmonics=1, noise=0.0, vibrato=0.0):
+    """Monophonic melody with rests; returns (signal, [(midi, t0, t1), ...])."""
+    chunks, notes = [], []
+    t = 0.0
+    while t < seconds:
+        dur = float(rng.uniform(0.15, 0.8))
+        n = int(dur * SR)
+        tt = np.arange(n) / SR
+        if rng.random() < 0.15:
+            chunks.append(np.zeros(n))
+        else:
+            midi = int(rng.integers(45, 84))
+            f = 440.0 * 2 ** ((midi - 69) / 12) * (1 + vibrato * np.sin(2 * np.pi * 5.5 * tt))
+            phase = 2 * np.pi * np.cumsum(f) / SR
+            env = np.minimum(1.0, np.minimum(tt, dur - tt) * 40)
+            y = sum(np.sin(k * phase) / k for k in range(1, harmonics + 1))
+            chunks.append(0.3 * env * y)
+            notes.append((midi, t, t + dur))
+        t += dur
+    y = np.concatenate(chunks)[:int(seconds * SR)]
+    y = y + noise * rng.standard_normal(len(y))
+    return y.astype(np.float32), notes
+
+
+def frame_truth(notes, n_frames, hop_length):
+    truth = np.full(n_frames, np.nan)
+    times = np.arange(n_frames) * hop_length / SR
+    for midi, t0, t1 in notes:
+        truth[(times >= t0) & (times < t1)] = midi
+    return truth
+
+
+def note_f1(events, notes, tolerance=0.05):
+    """Onset/pitch matched note F1 (each reference note matched at most once)."""
+    ref = [(m, t0) for m, t0, _ in notes]
+    est = [(int(round(12 * np.log2(_note_hz(name) / 440.0) + 69)), t0) for name, t0, _ in events]
+    used = set()
+    hits = 0
+    for m, t0 in est:
+        for k, (rm, rt0) in enumerate(ref):
+            if k not in used and rm == m and abs(rt0 - t0) <= tolerance:
+                used.add(k)
+                hits += 1
+                break
+    if not est or not ref:
+        return 0.0
+    precision, recall = hits / len(est), hits / len(ref)
+    return 0.0 if hits == 0 else 2 * precision * recall / (precision + recall)
+
+
+def _note_hz(name):
+    import pretty_midi
+    return 440.0 * 2 ** ((pretty_midi.note_name_to_number(name) - 69) / 12)
+
+
+SCENARIOS = {
+    "sine": dict(harmonics=1),
+    "harmonic+vibrato": dict(harmonics=5, vibrato=0.004),
+    "harmonic+noise": dict(harmonics=5, noise=0.02),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=30.0, help="length of each synthetic melody")
+    parser.add_argument("--output", help="write the markdown report here as well as to stdout")
+    args = parser.parse_args()
+
+    params = processing_params()
+    hop, frame = params["hop_length"], params["frame_length"]
+    rng = np.random.default_rng(7)
+    melodies = {name: synthetic_melody(args.seconds, rng, **kw) for name, kw in SCENARIOS.items()}
+
+    # one untimed run per engine so numba compilation is not billed to the first scenario
+    warm = melodies["sine"][0][:SR]
+    for engine in PITCH_ENGINES:
+        get_pitch_engine(engine)(warm, SR, params["fmin"], params["fmax"], hop, frame)
+
+    lines = [
+        f"# Pitch engine accuracy vs speed ({args.seconds:g} s synthetic melodies, sr={SR}, hop={hop})",
+        "",
+        "| scenario | engine | time (s) | x realtime | speedup vs pyin | frame accuracy | note F1 |",
+        "|---|---|---:|---:|---:|---:|---:|",
+    ]
+    for scenario, (y, notes) in melodies.items():
+        baseline = None
+        for engine in PITCH_ENGINES:
+            t0 = time.perf_counter()
+            f0, voiced = get_pitch_engine(engine)(y, SR, params["fmin"], params["fmax"], hop, frame)
+            elapsed = time.perf_counter() - t0
+            baseline = baseline or elapsed
+            midi = quantize_pitch(f0, voiced)
+            truth = frame_truth(notes, len(midi), hop)
+            agree = (np.isnan(midi) & np.isnan(truth)) | (midi == truth)
+            events = segment_notes(midi, np.arange(len(midi)) * hop / SR, hop / SR)
+            lines.append(f"| {scenario} | {engine} | {elapsed:.2f} | {args.seconds / elapsed:.0f} | "
+                         f"{baseline / elapsed:.1f}x | {agree.mean():.3f} | {note_f1(events, notes):.3f} |")
+
+    report = "\n".join(lines) + "\n"
+    print(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""Regression benchmark for the transcription pipeline with a per-stage breakdown.
+
+Generates synthetic stereo 44.1 kHz WAV inputs (sine melodies, chords, noise;
+10 s up to 30 min) and, for each one in a fresh process, runs the code path
+the service runs (processing.extract_events_timed on the file, then MIDI
+serialization) with the deployed defaults (windowed blocks with overlap,
+silence gate). Its StageTimer gives decode (with downmix), resample, pitch
+and segment; midi and the whole call ("e2e") are timed around it. The peak
+RSS of that process is recorded as well. Results are compared with a stored baseline and the run
+fails (exit code 1) when a metric regresses past the thresholds.
+
+Everything is generated locally; no network access is needed. The numba
+cache (NUMBA_CACHE_DIR, default <backend>/cache/numba as in main.py) is shared
+with the service, so only the very first run pays for JIT compilation.
+
+Run from service-2/backend:
+    python benchmarks/bench_pipeline.py                      # quick suite vs baseline_pipeline.json
+    python benchmarks/bench_pipeline.py --suite full         # adds 5 and 30 minute inputs
+    python benchmarks/bench_pipeline.py --update-baseline    # record this machine's numbers
+
+Timings only compare meaningfully on the machine that recorded the baseline;
+use --repeat 3 when gating changes on it.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import resource
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import soundfile as sf
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("NUMBA_CACHE_DIR", os.path.join(BACKEND_DIR, "cache", "numba"))
+
+SR_NATIVE = 44100
+STAGES = ["decode", "resample", "pitch", "segment", "midi"]
+METRICS = STAGES + ["e2e"]
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline_pipeline.json")
+
+# name -> (kind, seconds)
+SUITES = {
+    "quick": {
+        "melody_10s": ("melody", 10),
+        "chords_30s": ("chords", 30),
+        "noise_30s": ("noise", 30),
+        "melody_180s": ("melody", 180),
+    },
+}
+SUITES["full"] = dict(SUITES["quick"], melody_300s=("melody", 300), melody_1800s=("melody", 1800))
+
+
+def _note(midi, dur, rng, harmonics=3):
+    tt = np.arange(int(dur * SR_NATIVE)) / SR_NATIVE
+    f = 440.0 * 2 ** ((midi - 69) / 12)
+    env = np.minimum(1.0, np.minimum(tt, dur - tt) * 40)
+    return env * sum(np.sin(2 * np.pi * k * f * tt) / k for k in range(1, harmonics + 1))
+
+
+def synth_chunks(kind, seconds, rng, chunk_seconds=30.0):
+    """Yield mono float64 chunks of the synthetic signal so long inputs never sit in memory at once."""
+    produced = 0.0
+    while produced < seconds:
+        pieces, t = [], 0.0
+        target = min(chunk_seconds, seconds - produced)
+        while t < target:
+            dur = float(rng.uniform(0.15, 0.8))
+            if kind == "noise":
+                pieces.append(0.1 * rng.standard_normal(int(dur * SR_NATIVE)))
+            elif rng.random() < 0.15:
+                pieces.append(np.zeros(int(dur * SR_NATIVE)))
+            elif kind == "chords":
+                root = int(rng.integers(45, 72))
+                pieces.append(0.15 * sum(_note(root + i, dur, rng, harmonics=2) for i in (0, 4, 7)))
+            else:
+                pieces.append(0.3 * _note(int(rng.integers(45, 84)), dur, rng))
+            t += dur
+        yield np.concatenate(pieces)[:int(target * SR_NATIVE)]
+        produced += target
+
+
+def write_input(path, kind, seconds, seed):
+    rng = np.random.default_rng(seed)
+    with sf.SoundFile(path, "w", samplerate=SR_NATIVE, channels=2, subtype="PCM_16") as out:
+        for y in synth_chunks(kind, seconds, rng):
+            # stereo, as most uploads are
+            out.write(np.stack([y, 0.8 * y], axis=1))
+
+
+def run_scenario(path, params, repeat):
+    """Runs in a fresh worker process; returns {metric: seconds, "peak_rss_mb", "events"}."""
+    from processing import extract_events_timed, warm_up
+    from midi import events_to_midi_bytes
+
+    warm_up(**params)
+    best = {}
+    for _ in range(repeat):
+        started = time.perf_counter()
+        events, stats = extract_events_timed(path, **params)
+        serialized = time.perf_counter()
+        events_to_midi_bytes(events)
+        finished = time.perf_counter()
+        run = dict(stats["stages"], midi=finished - serialized, e2e=finished - started)
+        for name, seconds in run.items():
+            best[name] = min(best.get(name, seconds), seconds)
+
+    # ru_maxrss is in KiB on Linux
+    best["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    best["events"] = len(events)
+    return best
+
+
+def compare(results, baseline, threshold, rss_threshold, min_delta):
+    """Return (markdown rows, list of regression messages)."""
+    rows, regressions = [], []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for metric in METRICS + ["peak_rss_mb"]:
+            if metric not in base:
+                continue
+            old, new = base[metric], current[metric]
+            change = (new - old) / old if old else 0.0
+            if metric == "peak_rss_mb":
+                regressed = change > rss_threshold
+            else:
+                regressed = change > threshold and new - old > min_delta
+            flag = "REGRESSION" if regressed else ""
+            rows.append(f"| {name} | {metric} | {old:.3f} | {new:.3f} | {change:+.1%} | {flag} |")
+            if regressed:
+                regressions.append(f"{name} {metric}: {old:.3f} -> {new:.3f} ({change:+.1%})")
+    return rows, regressions
+
+
+def main():
+    from bulk_transcribe import silence_db_arg
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--suite", choices=sorted(SUITES), default="quick")
+    parser.add_argument("--only", nargs="*", help="run just these scenarios")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per scenario; the fastest is kept")
+    parser.add_argument("--quality", default="accurate")
+    parser.add_argument("--engine", default=None)
+    parser.add_argument("--block-seconds", type=float, default=120.0)
+    parser.add_argument("--silence-db", type=silence_db_arg, default=-60.0,
+                        help="silence gate in dBFS, or 'off' (default: the service's -60)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.35,
+                        help="allowed relative slowdown per stage (single runs vary by ~20%% on a busy box)")
+    parser.add_argument("--min-delta", type=float, default=0.05,
+                        help="ignore slowdowns smaller than this many seconds (timer noise)")
+    parser.add_argument("--rss-threshold", type=float, default=0.25, help="allowed relative peak RSS growth")
+    parser.add_argument("--output", help="write the markdown report here as well as to stdout")
+    args = parser.parse_args()
+
+    from processing import DEFAULT_ENGINE, processing_params, quality_params
+    params = processing_params(block_seconds=args.block_seconds, engine=args.engine or DEFAULT_ENGINE,
+                               silence_db=args.silence_db, **quality_params(args.quality))
+    scenarios = {name: spec for name, spec in SUITES[args.suite].items()
+                 if not args.only or name in args.only}
+
+    results = {}
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        for seed, (name, (kind, seconds)) in enumerate(scenarios.items()):
+            path = os.path.join(tmp, f"{name}.wav")
+            write_input(path, kind, seconds, seed)
+            # one process per scenario so peak RSS belongs to that input alone
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                result = pool.submit(run_scenario, path, params, args.repeat).result()
+            os.remove(path)
+            result["audio_seconds"] = seconds
+            results[name] = result
+            print(f"{name}: e2e {result['e2e']:.2f} s, peak RSS {result['peak_rss_mb']:.0f} MB", file=sys.stderr)
+
+    lines = [
+        f"# Pipeline benchmark ({args.suite} suite, quality={args.quality}, engine={params['engine']})",
+        "",
+        "| input | " + " | ".join(METRICS) + " | x realtime | peak RSS MB | events |",
+        "|---|" + "---:|" * (len(METRICS) + 3),
+    ]
+    for name, r in results.items():
+        cells = " | ".join(f"{r[m]:.3f}" for m in METRICS)
+        lines.append(f"| {name} | {cells} | {r['audio_seconds'] / r['e2e']:.1f} | "
+                     f"{r['peak_rss_mb']:.0f} | {r['events']} |")
+
+    regressions = []
+    if args.update_baseline:
+        baseline = {"machine": {"python": platform.python_version(), "platform": platform.platform(),
+                                "cpus": os.cpu_count()},
+                    "params": params, "results": results}
+        if os.path.isfile(args.baseline):
+            # keep scenarios of other suites recorded earlier
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline["results"] = dict(json.load(f).get("results", {}), **results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        lines += ["", f"Baseline written to {os.path.relpath(args.baseline)}"]
+    elif os.path.isfile(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows, regressions = compare(results, baseline["results"], args.threshold,
+                                    args.rss_threshold, args.min_delta)
+        lines += ["", f"## Against {os.path.relpath(args.baseline)} "
+                      f"(time +{args.threshold:.0%} and +{args.min_delta:g} s, RSS +{args.rss_threshold:.0%})", "",
+                  "| input | metric | baseline | current | change | |", "|---|---|---:|---:|---:|---|"] + rows
+        if baseline.get("params") != params:
+            lines += ["", "Note: processing parameters differ from the baseline run."]
+    else:
+        lines += ["", "No baseline found; run with --update-baseline to record one."]
+
+    report = "\n".join(lines) + "\n"
+    print(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report)
+    if regressions:
+        print("Regressions:\n  " + "\n  ".join(regressions), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
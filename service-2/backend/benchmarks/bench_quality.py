@@ -0,0 +1,107 @@
+"""Per-stage timings of the decode/resample quality tiers in processing.QUALITY_TIERS.
+
+Synthesizes a melody at common native rates (44.1 kHz, 48 kHz), writes it as
+WAV and FLAC and times each pipeline stage per tier.
+
+Run from service-2/backend:  python benchmarks/bench_quality.py [--seconds 60] [--output report.md]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from processing import (QUALITY_TIERS, analysis_rate, build_midi, get_pitch_engine,  # noqa: E402
+                        processing_params, quality_params, quantize_pitch, read_audio_mono,
+                        resample, segment_notes)
+
+
+def synthetic_melody(seconds, sr, rng):
+    chunks = []
+    t = 0.0
+    while t < seconds:
+        dur = float(rng.uniform(0.15, 0.8))
+        tt = np.arange(int(dur * sr)) / sr
+        if rng.random() < 0.15:
+            chunks.append(np.zeros(len(tt)))
+        else:
+            f = 440.0 * 2 ** ((int(rng.integers(45, 84)) - 69) / 12)
+            env = np.minimum(1.0, np.minimum(tt, dur - tt) * 40)
+            chunks.append(0.3 * env * sum(np.sin(2 * np.pi * k * f * tt) / k for k in range(1, 4)))
+        t += dur
+    y = np.concatenate(chunks)[:int(seconds * sr)]
+    # stereo, as most uploads are
+    return np.stack([y, 0.8 * y], axis=1).astype(np.float32)
+
+
+def run_stages(path, opts):
+    timings = {}
+    t0 = time.perf_counter()
+    y, sr_native = read_audio_mono(path)
+    timings["decode+mono"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    sr = analysis_rate(sr_native, opts["sr_target"], opts["decimate_native"])
+    y = resample(y, sr_native, sr, opts["res_type"])
+    timings["resample"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    f0, voiced = get_pitch_engine(opts["engine"])(y, sr, opts["fmin"], opts["fmax"],
+                                                  opts["hop_length"], opts["frame_length"])
+    timings["pitch"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    times = np.arange(len(f0)) * opts["hop_length"] / sr
+    events = segment_notes(quantize_pitch(f0, voiced), times, opts["hop_length"] / sr)
+    timings["segment"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    build_midi(events)
+    timings["midi"] = time.perf_counter() - t0
+    return sr, timings, len(events)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--output", help="write the markdown report here as well as to stdout")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(3)
+    stages = ["decode+mono", "resample", "pitch", "segment", "midi"]
+    lines = [
+        f"# Quality tier per-stage timings ({args.seconds:g} s stereo melody, seconds per stage)",
+        "",
+        "| source | tier | analysis sr | " + " | ".join(stages) + " | total | events |",
+        "|---|---|---:|" + "---:|" * (len(stages) + 2),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        # warm up numba/resampler code paths so the first row is not penalised
+        warm = os.path.join(tmp, "warm.wav")
+        sf.write(warm, synthetic_melody(1.0, 44100, rng), 44100)
+        for tier in QUALITY_TIERS:
+            run_stages(warm, processing_params(**quality_params(tier)))
+
+        for sr_native in (44100, 48000):
+            audio = synthetic_melody(args.seconds, sr_native, rng)
+            for ext in ("wav", "flac"):
+                path = os.path.join(tmp, f"melody_{sr_native}.{ext}")
+                sf.write(path, audio, sr_native)
+                for tier in QUALITY_TIERS:
+                    sr, timings, n_events = run_stages(path, processing_params(**quality_params(tier)))
+                    total = sum(timings.values())
+                    cells = " | ".join(f"{timings[s]:.3f}" for s in stages)
+                    lines.append(f"| {sr_native} Hz {ext} | {tier} | {sr} | {cells} | {total:.2f} | {n_events} |")
+
+    report = "\n".join(lines) + "\n"
+    print(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Short-clip latency under long-job load with and without the fast lane (admission.AdmissionController).
+
+Simulates the service's slots with timed sleeps instead of transcriptions
+(``--speedup`` times faster than real time), so it measures scheduling alone:
+a steady stream of long recordings keeps every slot busy while short clips
+arrive at random. Work takes ``--cost`` wall seconds per audio second. The
+report shows p50/p95 latency (wait + work) of short clips and the long audio
+transcribed per second for each number of reserved fast-lane slots.
+
+Run from service-2/backend:  python benchmarks/bench_scheduling.py [--slots 4] [--output report.md]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from admission import AdmissionController  # noqa: E402
+
+
+async def simulate(slots, fast_slots, args, seed):
+    rng = np.random.default_rng(seed)
+    admission = AdmissionController(slots, max_queue=10 ** 6, fast_seconds=args.fast_seconds,
+                                    fast_slots=fast_slots)
+    scale = args.cost / args.speedup
+    short_latencies = []
+    long_audio = 0.0
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + args.duration / args.speedup
+
+    async def transcribe(audio):
+        async with admission.slot(audio, shed=False):
+            await asyncio.sleep(audio * scale)
+
+    async def long_stream():
+        # more long recordings than slots, so every slot a long one may take stays busy
+        nonlocal long_audio
+        while loop.time() < deadline:
+            audio = float(rng.uniform(300, 1800))
+            await transcribe(audio)
+            long_audio += audio
+
+    async def short_clip():
+        audio = float(rng.uniform(3, args.fast_seconds))
+        started = time.perf_counter()
+        await transcribe(audio)
+        short_latencies.append((time.perf_counter() - started) * args.speedup)
+
+    longs = [asyncio.create_task(long_stream()) for _ in range(slots * 2)]
+    shorts = []
+    while loop.time() < deadline:
+        shorts.append(asyncio.create_task(short_clip()))
+        await asyncio.sleep(float(rng.exponential(args.short_interval / args.speedup)))
+    await asyncio.gather(*shorts)
+    for task in longs:
+        task.cancel()
+    await asyncio.gather(*longs, return_exceptions=True)
+    return np.percentile(short_latencies, 50), np.percentile(short_latencies, 95), len(short_latencies), \
+        long_audio / args.duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--slots", type=int, default=4)
+    parser.add_argument("--fast-seconds", type=float, default=30.0)
+    parser.add_argument("--cost", type=float, default=0.2, help="wall seconds per audio second")
+    parser.add_argument("--short-interval", type=float, default=5.0, help="mean seconds between short clips")
+    parser.add_argument("--duration", type=float, default=1800.0, help="simulated seconds of load")
+    parser.add_argument("--speedup", type=float, default=100.0, help="simulated time runs this much faster")
+    parser.add_argument("--output", help="write the markdown report here as well as to stdout")
+    args = parser.parse_args()
+
+    lines = [
+        f"# Short clips (<= {args.fast_seconds:g} s) under long-job load, {args.slots} slots, "
+        f"{args.cost:g} s of work per audio second",
+        "",
+        "| fast lane slots | short p50 s | short p95 s | short clips | long audio s per wall s |",
+        "|---:|---:|---:|---:|---:|",
+    ]
+    for fast_slots in (0, 1, 2):
+        if fast_slots >= args.slots:
+            continue
+        p50, p95, count, long_rate = asyncio.run(simulate(args.slots, fast_slots, args, seed=11))
+        lines.append(f"| {fast_slots} | {p50:.2f} | {p95:.2f} | {count} | {long_rate:.1f} |")
+
+    report = "\n".join(lines) + "\n"
+    print(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report)
+
+
+if __name__ == "__main__":
+    main()
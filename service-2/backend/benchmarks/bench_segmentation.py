@@ -0,0 +1,97 @@
+"""Micro-benchmark: per-frame loop vs array-based pitch quantization + note segmentation.
+
+Run from service-2/backend:  python benchmarks/bench_segmentation.py [--minutes 1 5 20]
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import librosa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from processing import freq_to_midi_note, midi_to_note_name, quantize_pitch, segment_notes  # noqa: E402
+
+SR = 22050
+HOP = 512
+
+
+def legacy_loop(f0, voiced_flag, times, frame_duration):
+    # the original implementation of extract_notes_from_audio_bytes, kept as reference
+    midi_notes = np.full_like(f0, fill_value=np.nan)
+    for i, (f, v) in enumerate(zip(f0, voiced_flag)):
+        if v and not np.isnan(f):
+            midi_notes[i] = freq_to_midi_note(f)
+
+    events = []
+    i = 0
+    n = len(midi_notes)
+    while i < n:
+        if np.isnan(midi_notes[i]):
+            i += 1
+            continue
+        note_val = int(midi_notes[i])
+        t_start = float(times[i])
+        j = i + 1
+        while j < n and (not np.isnan(midi_notes[j])) and int(np.round(midi_notes[j])) == note_val:
+            j += 1
+        t_end = float(times[j-1] + frame_duration)
+        events.append((midi_to_note_name(note_val), t_start, t_end))
+        i = j
+    return events
+
+
+def vectorized(f0, voiced_flag, times, frame_duration):
+    return segment_notes(quantize_pitch(f0, voiced_flag), times, frame_duration)
+
+
+def synthetic_f0(n_frames, rng):
+    """pYIN-like output: held notes with vibrato, separated by unvoiced gaps."""
+    f0 = np.empty(n_frames)
+    voiced = np.zeros(n_frames, dtype=bool)
+    i = 0
+    while i < n_frames:
+        length = int(rng.integers(5, 60))
+        if rng.random() < 0.2:
+            f0[i:i + length] = np.nan
+        else:
+            base = librosa.midi_to_hz(rng.integers(40, 90))
+            f0[i:i + length] = base * (1 + 0.01 * rng.standard_normal(len(f0[i:i + length])))
+            voiced[i:i + length] = True
+        i += length
+    return f0, voiced
+
+
+def best_of(fn, args, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frame_duration = HOP / SR
+    print(f"{'audio':>8} {'frames':>9} {'loop (s)':>10} {'array (s)':>10} {'speedup':>8}")
+    for minutes in args.minutes:
+        n_frames = int(minutes * 60 * SR / HOP)
+        f0, voiced = synthetic_f0(n_frames, rng)
+        times = librosa.frames_to_time(np.arange(n_frames), sr=SR, hop_length=HOP)
+        call = (f0, voiced, times, frame_duration)
+
+        t_loop, ev_loop = best_of(legacy_loop, call, args.repeat)
+        t_vec, ev_vec = best_of(vectorized, call, args.repeat)
+        if ev_loop != ev_vec:
+            raise SystemExit(f"event mismatch at {minutes} min: {len(ev_loop)} vs {len(ev_vec)} events")
+        print(f"{minutes:>6g}m {n_frames:>9d} {t_loop:>10.4f} {t_vec:>10.4f} {t_loop / t_vec:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
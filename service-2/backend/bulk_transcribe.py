@@ -0,0 +1,206 @@
+"""Offline bulk transcription of a directory tree, without the HTTP service.
+
+Walks INPUT_DIR for audio files and transcribes them on all cores (one
+process per core), writing ``<file>.mid`` and ``<file>.events.json`` (e.g.
+``take1.wav.mid``) into OUTPUT_DIR with the input's relative layout, plus
+``manifest.jsonl``: one line per finished file (status, events, audio
+seconds, outputs). The manifest is appended and flushed as results arrive,
+so a crashed or interrupted run started again with the same arguments skips
+every file already transcribed (same size, mtime and parameters) and retries
+failed ones. Progress and throughput in audio-seconds per wall-second go to
+stderr.
+
+Run from service-2/backend:
+    python bulk_transcribe.py /data/library /data/library-midi
+    python bulk_transcribe.py /data/library /data/library-midi --quality fast --workers 8
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+AUDIO_EXTENSIONS = (".wav", ".flac", ".mp3", ".ogg", ".aiff")
+MANIFEST_NAME = "manifest.jsonl"
+STATUS_OK = "ok"
+STATUS_FAILED = "failed"
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+# same persistent numba cache as the service, so workers load compiled pYIN instead of recompiling
+os.environ.setdefault("NUMBA_CACHE_DIR", os.path.join(BACKEND_DIR, "cache", "numba"))
+
+from processing import (DEFAULT_ENGINE, PITCH_ENGINES, QUALITY_TIERS, extract_events_timed,  # noqa: E402
+                        processing_params, quality_params, warm_up)
+from midi import events_to_midi_bytes  # noqa: E402
+
+
+def find_audio(root: str):
+    """Relative paths of the audio files under ``root``, sorted."""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in filenames:
+            if name.lower().endswith(AUDIO_EXTENSIONS):
+                found.append(os.path.relpath(os.path.join(dirpath, name), root))
+    return sorted(found)
+
+
+def params_digest(params: dict) -> str:
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def load_manifest(path: str) -> dict:
+    """Latest manifest record per input; a line cut short by a crash is ignored."""
+    records = {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                records[record["path"]] = record
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def is_done(record, size: int, mtime: float, digest: str, output_dir: str) -> bool:
+    return (record is not None and record.get("status") == STATUS_OK
+            and record.get("size") == size and record.get("mtime") == mtime
+            and record.get("params") == digest
+            and all(os.path.isfile(os.path.join(output_dir, record[key])) for key in ("midi", "events_json")))
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    # complete or absent, never partial, if the run is killed mid-write
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def transcribe_one(input_dir: str, output_dir: str, rel: str, params: dict) -> dict:
+    """Transcribe one file and write its outputs; runs in a worker process."""
+    started = time.perf_counter()
+    events, stats = extract_events_timed(os.path.join(input_dir, rel), **params)
+    events = [{"note": str(note), "start": float(t0), "end": float(t1)} for note, t0, t1 in events]
+    # the extension stays in the name: song.wav and song.flac must not share outputs
+    midi_rel, events_rel = f"{rel}.mid", f"{rel}.events.json"
+    os.makedirs(os.path.dirname(os.path.join(output_dir, midi_rel)), exist_ok=True)
+    _write_atomic(os.path.join(output_dir, midi_rel), events_to_midi_bytes(events))
+    _write_atomic(os.path.join(output_dir, events_rel), json.dumps(events).encode("utf-8"))
+    return {
+        "events": len(events),
+        "audio_seconds": round(stats["audio_seconds"], 3),
+        "seconds": round(time.perf_counter() - started, 3),
+        "midi": midi_rel,
+        "events_json": events_rel,
+    }
+
+
+def _warm_up(params: dict) -> None:
+    # worker initializer: JIT before the first file; a failure here must not break the pool
+    try:
+        warm_up(**params)
+    except Exception as e:
+        print(f"Worker warm-up failed: {type(e).__name__}: {e}", file=sys.stderr)
+
+
+def silence_db_arg(value: str):
+    """--silence-db: a dBFS level, or off/none for no gate."""
+    if value.strip().lower() in ("", "off", "none"):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a dBFS level or 'off', got {value!r}") from None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument("--workers", type=int, default=0, help="worker processes (default: one per core)")
+    parser.add_argument("--quality", default="accurate", choices=list(QUALITY_TIERS))
+    parser.add_argument("--engine", default=DEFAULT_ENGINE, choices=list(PITCH_ENGINES), help="pitch tracker")
+    parser.add_argument("--block-seconds", type=float, default=120.0,
+                        help="windowed processing above this length, as TRANSCRIBE_BLOCK_SECONDS")
+    parser.add_argument("--silence-db", type=silence_db_arg, default=-60.0, help="silence gate in dBFS, or 'off'")
+    parser.add_argument("--limit", type=int, default=0, help="stop after this many files (0: all)")
+    args = parser.parse_args()
+
+    params = processing_params(block_seconds=args.block_seconds, engine=args.engine,
+                               silence_db=args.silence_db, **quality_params(args.quality))
+    digest = params_digest(params)
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    manifest_path = os.path.join(args.output_dir, MANIFEST_NAME)
+    done = load_manifest(manifest_path)
+    todo, skipped = [], 0
+    for rel in find_audio(args.input_dir):
+        st = os.stat(os.path.join(args.input_dir, rel))
+        if is_done(done.get(rel), st.st_size, st.st_mtime, digest, args.output_dir):
+            skipped += 1
+        else:
+            todo.append((rel, st.st_size, st.st_mtime))
+    if args.limit:
+        todo = todo[:args.limit]
+    print(f"{len(todo)} files to transcribe, {skipped} already done; {workers} workers", file=sys.stderr)
+    if not todo:
+        return
+
+    started = time.perf_counter()
+    audio_total = 0.0
+    finished = failed = 0
+    ctx = multiprocessing.get_context("spawn")
+    with open(manifest_path, "a", encoding="utf-8") as manifest, \
+            ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_warm_up,
+                                initargs=(params,)) as pool:
+        queue = iter(todo)
+        pending = {}
+
+        def submit_next():
+            item = next(queue, None)
+            if item is not None:
+                pending[pool.submit(transcribe_one, args.input_dir, args.output_dir, item[0], params)] = item
+
+        # a couple of files per worker in flight keeps every core busy without queuing the whole tree
+        for _ in range(2 * workers):
+            submit_next()
+        while pending:
+            completed, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in completed:
+                rel, size, mtime = pending.pop(future)
+                record = {"path": rel, "size": size, "mtime": mtime, "params": digest}
+                try:
+                    record.update(future.result(), status=STATUS_OK)
+                    audio_total += record["audio_seconds"]
+                    outcome = f"{record['events']} events, {record['audio_seconds']:.1f} s audio"
+                except Exception as e:
+                    failed += 1
+                    record.update(status=STATUS_FAILED, error=f"{type(e).__name__}: {e}")
+                    outcome = f"FAILED ({record['error']})"
+                manifest.write(json.dumps(record) + "\n")
+                manifest.flush()
+                os.fsync(manifest.fileno())
+                finished += 1
+                wall = time.perf_counter() - started
+                print(f"[{finished}/{len(todo)}] {rel}: {outcome}; "
+                      f"{audio_total / wall:.1f} audio-s/wall-s", file=sys.stderr)
+                submit_next()
+
+    wall = time.perf_counter() - started
+    print(f"Done: {finished - failed} transcribed, {failed} failed, {skipped} skipped; "
+          f"{audio_total:.0f} s of audio in {wall:.0f} s ({audio_total / wall:.1f} audio-s/wall-s)",
+          file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
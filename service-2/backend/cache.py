@@ -0,0 +1,149 @@
+import os
+import json
+import uuid
+import shutil
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger("mutrapro")
+
+
+def make_key(content_hash: str, params: dict) -> str:
+    """Cache key for audio content (sha256 hex digest) processed with ``params``."""
+    h = hashlib.sha256(content_hash.encode("ascii"))
+    h.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
+class ResultCache:
+    """Content-addressed store of normalized events + MIDI, bounded by disk size.
+
+    Each entry is ``<key>.json`` (events) plus an optional ``<key>.mid``.
+    Least recently used entries are evicted once ``max_bytes`` is exceeded;
+    ``max_bytes <= 0`` disables the cache. get() and put() read and write
+    files (thread-safe): call them from a thread in async code; contains()
+    only checks the index.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> bytes on disk, oldest first
+        self._total_bytes = 0
+        if self.enabled:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._load()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _paths(self, key: str):
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.json", f"{base}.mid"
+
+    def _load(self) -> None:
+        # rebuild the LRU order from modification times left by previous runs
+        found = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            key = name[:-5]
+            json_path, midi_path = self._paths(key)
+            try:
+                mtime = os.path.getmtime(json_path)
+                size = os.path.getsize(json_path)
+                if os.path.isfile(midi_path):
+                    size += os.path.getsize(midi_path)
+            except OSError:
+                continue
+            found.append((mtime, key, size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+        self._evict()
+        logger.info("Result cache: %d entries, %d bytes in %s",
+                    len(self._entries), self._total_bytes, self.cache_dir)
+
+    def contains(self, key: str) -> bool:
+        """Whether ``key`` is cached, without reading the entry."""
+        return self.enabled and key in self._entries
+
+    def get(self, key: str):
+        """Return ``(events, midi_path_or_None)`` for a cached result, or None."""
+        if not self.enabled:
+            return None
+        json_path, midi_path = self._paths(key)
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            try:
+                with open(json_path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+                os.utime(json_path)
+            except (OSError, ValueError):
+                self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return entry["events"], (midi_path if entry.get("midi") else None)
+
+    def put(self, key: str, events, midi_src_path=None) -> None:
+        """Store events and a copy of the MIDI file written for this result."""
+        if not self.enabled:
+            return
+        json_path, midi_path = self._paths(key)
+        has_midi = bool(midi_src_path) and os.path.isfile(midi_src_path)
+        # unique temp names: concurrent puts of the same key must not write into one file
+        suffix = f".{uuid.uuid4().hex}.tmp"
+        try:
+            if has_midi:
+                shutil.copyfile(midi_src_path, midi_path + suffix)
+                os.replace(midi_path + suffix, midi_path)
+            with open(json_path + suffix, "w", encoding="utf-8") as f:
+                json.dump({"events": events, "midi": has_midi}, f)
+            os.replace(json_path + suffix, json_path)
+            size = os.path.getsize(json_path) + (os.path.getsize(midi_path) if has_midi else 0)
+        except OSError:
+            logger.exception("Failed to store cache entry %s", key)
+            return
+        with self._lock:
+            self._total_bytes -= self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._total_bytes += size
+            self._evict()
+
+    def _drop(self, key: str) -> None:
+        self._total_bytes -= self._entries.pop(key, 0)
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes and self._entries:
+            key = next(iter(self._entries))
+            self._drop(key)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+        }
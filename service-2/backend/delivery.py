@@ -0,0 +1,92 @@
+import os
+import stat
+import hashlib
+import threading
+from collections import OrderedDict
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+# Output files are written once under unique names (uuid-prefixed MIDI/events/archives) and
+# never modified in place, so clients may cache them for good.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# small JSON documents that change (job status): cache, but revalidate every time
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+_ETAG_CACHE_SIZE = 4096
+_etags = OrderedDict()  # (path, inode, size, mtime_ns) -> strong ETag
+_etags_lock = threading.Lock()
+
+
+def file_etag(path: str, stat_result: os.stat_result) -> str:
+    """Strong ETag from the sha256 of the file content; hashed once per file version."""
+    key = (path, stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns)
+    with _etags_lock:
+        etag = _etags.get(key)
+        if etag is not None:
+            _etags.move_to_end(key)
+            return etag
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    etag = f'"{digest.hexdigest()[:32]}"'
+    with _etags_lock:
+        _etags[key] = etag
+        while len(_etags) > _ETAG_CACHE_SIZE:
+            _etags.popitem(last=False)
+    return etag
+
+
+def _not_modified(response_headers, request_headers: Headers) -> bool:
+    # same rules as StaticFiles (If-None-Match wins over If-Modified-Since)
+    return StaticFiles.is_not_modified(None, response_headers, request_headers)
+
+
+def output_file_response(path: str, request_headers: Headers, stat_result: os.stat_result = None,
+                         media_type: str = None, filename: str = None, status_code: int = 200) -> Response:
+    """FileResponse for an output file with a strong ETag and immutable caching.
+
+    Answers 304 to matching If-None-Match / If-Modified-Since; byte ranges
+    (Range, If-Range) are served by FileResponse. Hashes the file on first
+    use, so call it from a thread.
+    """
+    stat_result = stat_result or os.stat(path)
+    headers = {
+        "etag": file_etag(path, stat_result),
+        "cache-control": IMMUTABLE_CACHE_CONTROL,
+        "accept-ranges": "bytes",
+    }
+    response = FileResponse(path, status_code=status_code, headers=headers, media_type=media_type,
+                            filename=filename, stat_result=stat_result)
+    if _not_modified(response.headers, request_headers):
+        return NotModifiedResponse(response.headers)
+    return response
+
+
+def conditional_response(response: Response, request_headers: Headers) -> Response:
+    """Add a body-hash ETag to an in-memory response; 304 when the client already has it."""
+    etag = f'"{hashlib.sha256(response.body).hexdigest()[:32]}"'
+    response.headers["etag"] = etag
+    response.headers["cache-control"] = REVALIDATE_CACHE_CONTROL
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in
+                          [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]):
+        return NotModifiedResponse(response.headers)
+    return response
+
+
+class OutputStaticFiles(StaticFiles):
+    """StaticFiles for OUTPUT_DIR with content-hash ETags and immutable cache headers."""
+
+    def lookup_path(self, path: str):
+        # runs in a worker thread: hash here so file_response() (on the event loop) hits the cache
+        full_path, stat_result = super().lookup_path(path)
+        if stat_result is not None and stat.S_ISREG(stat_result.st_mode):
+            file_etag(full_path, stat_result)
+        return full_path, stat_result
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200) -> Response:
+        return output_file_response(str(full_path), Headers(scope=scope), stat_result=stat_result,
+                                    status_code=status_code)
@@ -0,0 +1,114 @@
+import os
+import time
+import asyncio
+import functools
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger("mutrapro")
+
+# Number of worker processes used for CPU-bound processing.py work (decode, pYIN, MIDI build).
+# TRANSCRIBE_WORKERS=0 (default) means one worker per available core.
+TRANSCRIBE_WORKERS = int(os.environ.get("TRANSCRIBE_WORKERS", "0") or "0")
+if TRANSCRIBE_WORKERS <= 0:
+    TRANSCRIBE_WORKERS = os.cpu_count() or 1
+
+# "spawn" keeps workers independent from the event loop threads of the parent process
+TRANSCRIBE_START_METHOD = os.environ.get("TRANSCRIBE_START_METHOD", "spawn")
+
+_executor = None
+# optional (fn, args) run once in every worker process before it takes work
+_initializer = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """Return the shared process pool, creating it on first use."""
+    global _executor
+    if _executor is None:
+        ctx = multiprocessing.get_context(TRANSCRIBE_START_METHOD)
+        init_fn, init_args = _initializer or (None, ())
+        _executor = ProcessPoolExecutor(max_workers=TRANSCRIBE_WORKERS, mp_context=ctx,
+                                        initializer=init_fn, initargs=init_args)
+        logger.info("Started transcription process pool with %d workers (%s)",
+                    TRANSCRIBE_WORKERS, TRANSCRIBE_START_METHOD)
+    return _executor
+
+
+def set_worker_initializer(fn, *args) -> None:
+    """Register a picklable callable every worker runs at start; must be set before first use."""
+    global _initializer
+    if _executor is not None:
+        raise RuntimeError("process pool already started")
+    _initializer = (fn, args)
+
+
+def worker_pid() -> int:
+    # trivial task used to find out which workers are up (and therefore initialized)
+    return os.getpid()
+
+
+async def start_all_workers(max_rounds: int = 20) -> int:
+    """Make sure every worker process is running and has finished its initializer.
+
+    Tasks only complete after the worker's initializer ran, so submit pings
+    until TRANSCRIBE_WORKERS distinct processes have answered.
+    """
+    seen = set()
+    for _ in range(max_rounds):
+        pids = await asyncio.gather(*(run_in_pool(worker_pid) for _ in range(TRANSCRIBE_WORKERS)))
+        seen.update(pids)
+        if len(seen) >= TRANSCRIBE_WORKERS:
+            break
+    return len(seen)
+
+
+def _replace_broken(executor: ProcessPoolExecutor) -> None:
+    # a worker died (OOM kill, native crash): the pool refuses all work from now on, so
+    # drop it; the next task starts a fresh one (with the worker initializer again)
+    global _executor
+    if _executor is executor:
+        _executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+        logger.error("Transcription process pool broken (a worker died); starting a new one")
+
+
+async def _run(call):
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+    try:
+        return await loop.run_in_executor(executor, call)
+    except BrokenProcessPool:
+        # only the tasks that were on the broken pool fail
+        _replace_broken(executor)
+        raise
+
+
+async def run_in_pool(fn, *args, **kwargs):
+    """Run a picklable callable in the process pool and await its result.
+
+    Raises BrokenProcessPool when a worker died while the task was pending;
+    later calls get a new pool.
+    """
+    return await _run(functools.partial(fn, *args, **kwargs))
+
+
+def _started_call(fn, args, kwargs):
+    # runs in the worker: report when the task actually started
+    return time.time(), fn(*args, **kwargs)
+
+
+async def run_in_pool_timed(fn, *args, **kwargs):
+    """Like run_in_pool, but returns ``(result, seconds the task waited for a free worker)``."""
+    submitted = time.time()
+    started, result = await _run(functools.partial(_started_call, fn, args, kwargs))
+    return result, max(0.0, started - submitted)
+
+
+def shutdown_executor(wait: bool = True) -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=wait, cancel_futures=True)
+        _executor = None
+        logger.info("Transcription process pool stopped")
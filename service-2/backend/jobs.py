@@ -0,0 +1,235 @@
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger("mutrapro")
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# how often idle workers re-check the queue when nobody notified them
+JOB_POLL_INTERVAL = 1.0
+
+
+class JobStore:
+    """Durable transcription job queue backed by a single SQLite file."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                progress REAL NOT NULL DEFAULT 0,
+                filename TEXT NOT NULL,
+                upload_path TEXT NOT NULL,
+                params TEXT,
+                audio_seconds REAL,
+                result TEXT,
+                preview TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "params" not in columns:
+            # databases created before per-job processing options existed
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN params TEXT")
+        if "preview" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN preview TEXT")
+        if "audio_seconds" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN audio_seconds REAL")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)")
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def create(self, filename: str, upload_path: str, params: dict = None, preview: dict = None,
+               audio_seconds: float = None) -> str:
+        """Queue a job; ``params`` are processing options handed back to the worker.
+
+        ``preview`` is an optional coarse result served until the job is done;
+        ``audio_seconds`` (from the file header) lets short jobs be claimed first.
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._execute(
+            "INSERT INTO jobs (id, status, progress, filename, upload_path, params, preview, audio_seconds, "
+            "created_at, updated_at) VALUES (?, ?, 0, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, JOB_QUEUED, filename, upload_path, json.dumps(params or {}),
+             json.dumps(preview) if preview is not None else None, audio_seconds, now, now),
+        )
+        return job_id
+
+    @staticmethod
+    def _job(row):
+        job = dict(row)
+        job["params"] = json.loads(job["params"]) if job.get("params") else {}
+        return job
+
+    def get(self, job_id: str):
+        row = self._execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row else None
+
+    def claim_next(self, fast_seconds: float = 0, short_only: bool = False):
+        """Atomically move the next queued job to running and return it (or None).
+
+        Jobs of at most ``fast_seconds`` of audio go first, oldest first within
+        each group; with ``short_only`` longer jobs are not claimed at all.
+        Jobs of unknown length count as short.
+        """
+        where = "status = :status"
+        if short_only:
+            where += " AND COALESCE(audio_seconds, 0) <= :fast"
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    f"SELECT * FROM jobs WHERE {where} "
+                    "ORDER BY COALESCE(audio_seconds, 0) > :fast, created_at LIMIT 1",
+                    {"status": JOB_QUEUED, "fast": fast_seconds},
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, progress = 0, updated_at = ? WHERE id = ?",
+                        (JOB_RUNNING, time.time(), row["id"]),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        job = self._job(row)
+        job["status"] = JOB_RUNNING
+        return job
+
+    def set_progress(self, job_id: str, progress: float) -> None:
+        self._execute(
+            "UPDATE jobs SET progress = ?, updated_at = ? WHERE id = ?",
+            (float(progress), time.time(), job_id),
+        )
+
+    def finish(self, job_id: str, result: dict) -> None:
+        self._execute(
+            "UPDATE jobs SET status = ?, progress = 1, result = ?, updated_at = ? WHERE id = ?",
+            (JOB_DONE, json.dumps(result), time.time(), job_id),
+        )
+
+    def fail(self, job_id: str, error: str) -> None:
+        self._execute(
+            "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+            (JOB_FAILED, error, time.time(), job_id),
+        )
+
+    def requeue_running(self) -> int:
+        """Put jobs interrupted by a restart back on the queue."""
+        cur = self._execute(
+            "UPDATE jobs SET status = ?, progress = 0, updated_at = ? WHERE status = ?",
+            (JOB_QUEUED, time.time(), JOB_RUNNING),
+        )
+        return cur.rowcount
+
+    def active_upload_paths(self) -> set:
+        """Upload files still needed by queued or running jobs."""
+        rows = self._execute("SELECT upload_path FROM jobs WHERE status IN (?, ?)",
+                             (JOB_QUEUED, JOB_RUNNING)).fetchall()
+        return {row["upload_path"] for row in rows}
+
+    @staticmethod
+    def to_response(job: dict) -> dict:
+        response = {
+            "job_id": job["id"],
+            "status": job["status"],
+            "progress": job["progress"],
+            "created_at": job["created_at"],
+            "updated_at": job["updated_at"],
+        }
+        if job["status"] == JOB_DONE and job["result"]:
+            # same events / midi_file payload as POST /trans
+            response.update(json.loads(job["result"]))
+        elif job["status"] == JOB_FAILED:
+            response["success"] = False
+            response["error"] = job["error"]
+        elif job.get("preview"):
+            # replaced by the full result once the job is done
+            response.update(json.loads(job["preview"]))
+            response["preview"] = True
+        return response
+
+
+class JobRunner:
+    """Pool of asyncio workers draining a JobStore.
+
+    ``process(job, progress)`` is awaited for each job and must return a
+    JSON-serialisable result; ``progress`` accepts a fraction in [0, 1].
+    Jobs of at most ``fast_seconds`` of audio are claimed first, and
+    ``fast_workers`` extra workers take only those, so short jobs never wait
+    for a worker busy with a long recording.
+    """
+
+    def __init__(self, store: JobStore, process, workers: int = 1, fast_workers: int = 0,
+                 fast_seconds: float = 0):
+        self.store = store
+        self.process = process
+        self.workers = max(1, workers)
+        self.fast_workers = max(0, fast_workers)
+        self.fast_seconds = fast_seconds
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+
+    def start(self) -> None:
+        requeued = self.store.requeue_running()
+        if requeued:
+            logger.info("Requeued %d interrupted transcription jobs", requeued)
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers + self.fast_workers)]
+        self._wakeup.set()
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        """Wake idle workers after a new job was queued."""
+        self._wakeup.set()
+
+    async def _worker(self, index: int) -> None:
+        short_only = index >= self.workers
+        while True:
+            job = self.store.claim_next(self.fast_seconds, short_only=short_only)
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            job_id = job["id"]
+            logger.info("Worker %d started job %s", index, job_id)
+            try:
+                result = await self.process(job, lambda p: self.store.set_progress(job_id, p))
+            except asyncio.CancelledError:
+                # leave it as running; requeue_running() picks it up on next start
+                raise
+            except Exception as e:
+                logger.exception("Job %s failed", job_id)
+                self.store.fail(job_id, f"Processing error: {e}")
+            else:
+                self.store.finish(job_id, result)
+                logger.info("Worker %d finished job %s", index, job_id)
@@ -1,24 +1,174 @@
 import os
+import json
 import time
+import asyncio
+import collections
+import zipfile
+import shutil
+import hashlib
 import uuid
 import logging
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import FileResponse
+from typing import List, Optional
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query, Header, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse, JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+import numpy as np
+import soundfile as sf
 import uvicorn
-from processing import extract_notes_from_audio_bytes  
+from starlette.concurrency import run_in_threadpool
+from processing import (extract_events_timed, processing_params, quality_params, warm_up_worker,
+                        StreamingTranscriber, PITCH_ENGINES, QUALITY_TIERS, PREVIEW_PARAMS)
+from executor import (run_in_pool, run_in_pool_timed, shutdown_executor, set_worker_initializer, start_all_workers,
+                      TRANSCRIBE_WORKERS)
+from jobs import JobStore, JobRunner, JOB_QUEUED
+from cache import ResultCache, make_key
+from singleflight import SingleFlight
+from admission import AdmissionController, Overloaded, audio_seconds, LONG_LANE
+from storage import StorageManager
+from shared_audio import SharedAudio, pitch_block_shared, stats as shared_audio_stats
+from delivery import OutputStaticFiles, output_file_response, conditional_response
+from midi import events_to_midi_bytes
+from responses import FastJSONResponse, check_accept, render_result
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, Registry, Counter, Gauge, Histogram, exponential_buckets
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 UPLOAD_DIR = os.path.join(BASE_DIR, "uploads")
 OUTPUT_DIR = os.path.join(BASE_DIR, "outputs")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(OUTPUT_DIR, exist_ok=True)
+# uploads are streamed to disk in chunks of this size and rejected above MAX_UPLOAD_MB
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_MB = float(os.environ.get("MAX_UPLOAD_MB", "200"))
+# maximum number of audio files accepted by one /trans/batch request (zip members included)
+MAX_BATCH_FILES = int(os.environ.get("MAX_BATCH_FILES", "50"))
+# durable job queue lives next to the uploads it refers to
+JOBS_DB = os.environ.get("JOBS_DB", os.path.join(UPLOAD_DIR, "jobs.db"))
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "0") or "0") or TRANSCRIBE_WORKERS
+# content-addressed result cache; CACHE_MAX_MB=0 disables it
+CACHE_DIR = os.environ.get("CACHE_DIR", os.path.join(BASE_DIR, "cache"))
+CACHE_MAX_MB = float(os.environ.get("CACHE_MAX_MB", "512"))
+# storage lifecycle: uploads/outputs older than these many hours are expired (0 keeps them),
+# then the oldest files above the byte quotas are removed (0 = no quota)
+UPLOAD_MAX_AGE_HOURS = float(os.environ.get("UPLOAD_MAX_AGE_HOURS", "24"))
+OUTPUT_MAX_AGE_HOURS = float(os.environ.get("OUTPUT_MAX_AGE_HOURS", "168"))
+UPLOAD_QUOTA_MB = float(os.environ.get("UPLOAD_QUOTA_MB", "0"))
+OUTPUT_QUOTA_MB = float(os.environ.get("OUTPUT_QUOTA_MB", "0"))
+# move expired uploads to UPLOAD_DIR/archive (PCM re-encoded as FLAC) instead of deleting them
+UPLOAD_ARCHIVE = os.environ.get("UPLOAD_ARCHIVE", "false").lower() in ("1", "true", "yes")
+ARCHIVE_QUOTA_MB = float(os.environ.get("ARCHIVE_QUOTA_MB", "0"))
+STORAGE_SWEEP_INTERVAL = float(os.environ.get("STORAGE_SWEEP_INTERVAL", "600"))
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("mutrapro")
 
-app = FastAPI(title="Music Transcriber - Offline")
+result_cache = ResultCache(CACHE_DIR, int(CACHE_MAX_MB * 1024 * 1024))
+
+# --- metrics (GET /metrics, Prometheus text format) -------------------------------------
+metrics_registry = Registry()
+upload_size_hist = Histogram(metrics_registry, "mutrapro_upload_size_bytes", "Size of uploaded files.",
+                             exponential_buckets(64 * 1024, 4, 8))
+audio_duration_hist = Histogram(metrics_registry, "mutrapro_audio_duration_seconds",
+                                "Duration of transcribed audio (cache misses only).",
+                                [1, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600])
+stage_hist = Histogram(metrics_registry, "mutrapro_stage_seconds",
+                       "Time spent per processing.py pipeline stage (decode, resample, pitch, segment).",
+                       exponential_buckets(0.001, 4, 10), labelnames=("stage",))
+queue_wait_hist = Histogram(metrics_registry, "mutrapro_queue_wait_seconds",
+                            "Time waiting for a process pool worker (queue=pool) or job worker (queue=jobs).",
+                            exponential_buckets(0.001, 4, 10), labelnames=("queue",))
+midi_write_hist = Histogram(metrics_registry, "mutrapro_midi_write_seconds",
+                            "Time to serialize and write a MIDI (or events) output file.",
+                            exponential_buckets(0.0005, 4, 8))
+transcription_hist = Histogram(metrics_registry, "mutrapro_transcription_seconds",
+                               "End-to-end transcription time by outcome (ok, cache_hit, coalesced, error).",
+                               exponential_buckets(0.01, 4, 10), labelnames=("outcome",))
+in_flight_gauge = Gauge(metrics_registry, "mutrapro_transcriptions_in_flight",
+                        "Transcriptions currently being processed.")
+coalesced_counter = Counter(metrics_registry, "mutrapro_coalesced_requests_total",
+                            "Requests answered by an identical transcription that was already running.")
+coalesced_work_counter = Counter(metrics_registry, "mutrapro_coalesced_work_seconds_total",
+                                 "Pipeline seconds (decode to segment) not spent thanks to coalescing.")
+admission_rejected_counter = Counter(metrics_registry, "mutrapro_admission_rejected_total",
+                                     "Transcription requests shed by admission control.", labelnames=("reason",))
+admission_wait_hist = Histogram(metrics_registry, "mutrapro_admission_wait_seconds",
+                                "Time transcriptions waited for an admission slot, by lane (fast, long).",
+                                exponential_buckets(0.001, 4, 10), labelnames=("lane",))
+admission_gauge = Gauge(metrics_registry, "mutrapro_admission_occupancy",
+                        "Admission occupancy: active and queued transcriptions per lane, queued audio seconds.",
+                        labelnames=("kind", "lane"))
+shared_audio_gauge = Gauge(metrics_registry, "mutrapro_shared_audio_bytes",
+                           "Bytes of decoded audio currently held in shared memory for the workers.")
+
+# recordings longer than this are transcribed in overlapping blocks with bounded memory;
+# 0 disables windowed mode (whole file decoded at once)
+TRANSCRIBE_BLOCK_SECONDS = float(os.environ.get("TRANSCRIBE_BLOCK_SECONDS", "120"))
+TRANSCRIBE_BLOCK_OVERLAP = float(os.environ.get("TRANSCRIBE_BLOCK_OVERLAP", "2"))
+# default pitch tracker (pyin | yin | pyin-fast); requests may override it with ?engine=
+PITCH_ENGINE = os.environ.get("PITCH_ENGINE", "pyin")
+if PITCH_ENGINE not in PITCH_ENGINES:
+    raise RuntimeError(f"PITCH_ENGINE must be one of {', '.join(PITCH_ENGINES)}")
+# frames quieter than this RMS level (dBFS) are not pitch-tracked, so long silences and
+# count-ins cost almost nothing; "off" tracks every frame
+SILENCE_GATE_DB = os.environ.get("SILENCE_GATE_DB", "-60").strip().lower()
+SILENCE_GATE_DB = None if SILENCE_GATE_DB in ("", "off", "none") else float(SILENCE_GATE_DB)
+# default decode/resample quality tier (fast | balanced | accurate); requests may override it with ?quality=
+TRANSCRIBE_QUALITY = os.environ.get("TRANSCRIBE_QUALITY", "accurate")
+if TRANSCRIBE_QUALITY not in QUALITY_TIERS:
+    raise RuntimeError(f"TRANSCRIBE_QUALITY must be one of {', '.join(QUALITY_TIERS)}")
+# live transcription over WebSocket: block size / context trade latency against accuracy
+STREAM_BLOCK_SECONDS = float(os.environ.get("STREAM_BLOCK_SECONDS", "1.0"))
+STREAM_OVERLAP_SECONDS = float(os.environ.get("STREAM_OVERLAP_SECONDS", "0.5"))
+STREAM_MAX_SECONDS = float(os.environ.get("STREAM_MAX_SECONDS", "3600"))
+# POST /trans/sse: seconds of audio per progress/partial-result event (blocks run in parallel)
+SSE_BLOCK_SECONDS = float(os.environ.get("SSE_BLOCK_SECONDS", "30"))
+# POST /trans/preview: seconds of audio in the coarse preview, and how long the request may
+# wait for it before answering with just the queued full-resolution job
+PREVIEW_SECONDS = float(os.environ.get("PREVIEW_SECONDS", str(PREVIEW_PARAMS["max_seconds"])))
+PREVIEW_BUDGET_SECONDS = float(os.environ.get("PREVIEW_BUDGET_SECONDS", "5"))
+# admission control: transcriptions running at once (0 = one per worker), requests that may wait
+# for a slot (0 = 4 per slot), total audio seconds those may add up to and how long each may
+# wait; beyond that requests are shed with 429/503 and Retry-After (0 disables the last two)
+ADMISSION_MAX_CONCURRENT = int(os.environ.get("ADMISSION_MAX_CONCURRENT", "0") or "0") or TRANSCRIBE_WORKERS
+ADMISSION_MAX_QUEUE = int(os.environ.get("ADMISSION_MAX_QUEUE", "0") or "0") or 4 * ADMISSION_MAX_CONCURRENT
+ADMISSION_MAX_QUEUED_AUDIO_SECONDS = float(os.environ.get("ADMISSION_MAX_QUEUED_AUDIO_SECONDS", "3600"))
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", "120"))
+# fast lane: recordings up to FAST_LANE_MAX_SECONDS (duration read from the header) are served
+# before longer ones, and FAST_LANE_SLOTS of the slots above are kept free of long recordings
+FAST_LANE_MAX_SECONDS = float(os.environ.get("FAST_LANE_MAX_SECONDS", "30"))
+FAST_LANE_SLOTS = int(os.environ.get("FAST_LANE_SLOTS", "1"))
+# eager: write the MIDI file with every result; lazy: store only the events and build
+# the MIDI the first time {API_PREFIX}/trans/midi/{name} is requested
+MIDI_MODE = os.environ.get("MIDI_MODE", "eager").lower()
+if MIDI_MODE not in ("eager", "lazy"):
+    raise RuntimeError("MIDI_MODE must be 'eager' or 'lazy'")
+# run a synthetic clip through every worker at startup; /ready reports not-ready until done
+TRANSCRIBE_WARMUP = os.environ.get("TRANSCRIBE_WARMUP", "true").lower() in ("1", "true", "yes")
+# persistent numba cache so restarted workers load compiled pYIN code instead of recompiling;
+# set before the workers start so they inherit it
+os.environ.setdefault("NUMBA_CACHE_DIR", os.path.join(CACHE_DIR, "numba"))
+
+app = FastAPI(title="Music Transcriber - Offline", default_response_class=FastJSONResponse)
+
+# multipart boundaries, part headers and form fields on top of the audio itself
+UPLOAD_OVERHEAD_BYTES = 64 * 1024
+
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    """413 from Content-Length before the body is read.
+
+    Starlette spools the whole multipart body to a temporary file before an
+    endpoint runs, so save_upload() alone only rejects an oversized upload
+    after it has been received. Bodies sent without Content-Length (chunked)
+    are still only checked by save_upload().
+    """
+    length = request.headers.get("content-length")
+    if request.method == "POST" and MAX_UPLOAD_MB > 0 and length and length.isdigit():
+        files = MAX_BATCH_FILES if request.url.path.endswith("/trans/batch") else 1
+        if int(length) > files * int(MAX_UPLOAD_MB * 1024 * 1024) + UPLOAD_OVERHEAD_BYTES:
+            return FastJSONResponse({"detail": f"File too large (max {MAX_UPLOAD_MB:g} MB)"}, status_code=413)
+    return await call_next(request)
+
 
 # CORS configuration: allow configuring allowed origins via environment variable
 # Set ALLOWED_ORIGINS to a comma-separated list of origins (e.g. https://example.com,http://localhost:3000)
@@ -49,34 +199,150 @@ from fastapi import APIRouter
 router = APIRouter()
 
 # serve outputs for MIDI download (static) at both root and prefixed path for flexibility
-app.mount("/outputs", StaticFiles(directory=OUTPUT_DIR), name="outputs")
+# (content-hash ETags, 304s, byte ranges and immutable cache headers: outputs are write-once)
+app.mount("/outputs", OutputStaticFiles(directory=OUTPUT_DIR), name="outputs")
 if API_PREFIX:
-    app.mount(f"{API_PREFIX}/outputs", StaticFiles(directory=OUTPUT_DIR), name="outputs_prefixed")
+    app.mount(f"{API_PREFIX}/outputs", OutputStaticFiles(directory=OUTPUT_DIR), name="outputs_prefixed")
 # NOTE: Do NOT mount "/" with static files as it will shadow all API routes
 # Instead, serve frontend separately or use a reverse proxy (nginx) in front
 # ----------------------------------------------------------------------------------------
 
-@router.post("/trans")
-async def trans(file: UploadFile = File(...)):
+AUDIO_EXTENSIONS = (".wav", ".flac", ".mp3", ".ogg", ".aiff")
+
+
+def check_audio_filename(filename: str) -> None:
     # basic validation
-    if not file.filename.lower().endswith((".wav", ".flac", ".mp3", ".ogg", ".aiff")):
+    if not filename or not filename.lower().endswith(AUDIO_EXTENSIONS):
         raise HTTPException(status_code=400, detail="Only audio files are supported (.wav .mp3 .flac .ogg .aiff)")
 
-    contents = await file.read()
-    # save upload for reference
-    fname = f"{uuid.uuid4().hex}_{file.filename}"
-    fpath = os.path.join(UPLOAD_DIR, fname)
-    with open(fpath, "wb") as f:
-        f.write(contents)
-    logger.info("Saved uploaded file to %s", fpath)
 
+async def save_upload(file: UploadFile, dedup: bool = True):
+    """Stream an upload to UPLOAD_DIR, hashing it on the way.
+
+    Returns (stored name, path, sha256 hex digest). The stored name is unique
+    per request (outputs are named after it); with ``dedup`` the file itself
+    is kept content-addressed, so ``path`` may be shared with other uploads.
+    Uploads larger than MAX_UPLOAD_MB are removed and rejected with 413.
+    """
+    fname = f"{uuid.uuid4().hex}_{os.path.basename(file.filename)}"
+    fpath = os.path.join(UPLOAD_DIR, fname)
+    max_bytes = int(MAX_UPLOAD_MB * 1024 * 1024)
+    digest = hashlib.sha256()
+    size = 0
+    f = await run_in_threadpool(open, fpath, "wb")
     try:
-        # extract_notes_from_audio_bytes should return (events, pretty_midi_object)
-        events_raw, pm = extract_notes_from_audio_bytes(contents)
-    except Exception as e:
-        logger.exception("Error extracting notes")
-        raise HTTPException(status_code=500, detail=f"Processing error: {e}")
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if max_bytes > 0 and size > max_bytes:
+                raise HTTPException(status_code=413, detail=f"File too large (max {MAX_UPLOAD_MB:g} MB)")
+            digest.update(chunk)
+            await run_in_threadpool(f.write, chunk)
+    except BaseException:
+        await run_in_threadpool(f.close)
+        os.remove(fpath)
+        raise
+    await run_in_threadpool(f.close)
+    upload_size_hist.observe(size)
+    content_hash = digest.hexdigest()
+    if dedup:
+        fpath = await run_in_threadpool(storage.adopt_upload, fpath, content_hash)
+    logger.info("Saved uploaded file to %s (%d bytes)", fpath, size)
+    return fname, fpath, content_hash
+
+
+def _zip_member_error(info):
+    """Why a zip member is not transcribed, or None when it is accepted."""
+    if not os.path.basename(info.filename).lower().endswith(AUDIO_EXTENSIONS):
+        return "Only audio files are supported (.wav .mp3 .flac .ogg .aiff)"
+    max_bytes = int(MAX_UPLOAD_MB * 1024 * 1024)
+    if max_bytes > 0 and info.file_size > max_bytes:
+        return f"File too large (max {MAX_UPLOAD_MB:g} MB)"
+    return None
 
+
+def extract_zip_uploads(zip_path: str, max_files: int):
+    """Unpack the audio members of an uploaded zip into UPLOAD_DIR.
+
+    Returns a list of (member name, stored name, path, sha256) for accepted
+    members and (member name, error) for rejected ones. More than
+    ``max_files`` accepted members are rejected with 413 before anything is
+    extracted. Runs in a thread.
+    """
+    items = []
+    with zipfile.ZipFile(zip_path) as zf:
+        members = [(info, _zip_member_error(info)) for info in zf.infolist() if not info.is_dir()]
+        if sum(1 for _, error in members if error is None) > max_files:
+            raise HTTPException(status_code=413, detail=f"Too many files in batch (max {MAX_BATCH_FILES})")
+        for info, error in members:
+            if error is not None:
+                items.append((info.filename, error))
+                continue
+            fname = f"{uuid.uuid4().hex}_{os.path.basename(info.filename)}"
+            fpath = os.path.join(UPLOAD_DIR, fname)
+            digest = hashlib.sha256()
+            with zf.open(info) as src, open(fpath, "wb") as dst:
+                for chunk in iter(lambda: src.read(UPLOAD_CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    dst.write(chunk)
+            fpath = storage.adopt_upload(fpath, digest.hexdigest())
+            items.append((info.filename, fname, fpath, digest.hexdigest()))
+    return items
+
+
+def build_midi_archive(midi_urls, archive_name: str):
+    """Zip the given output MIDI files into OUTPUT_DIR/archive_name. Runs in a thread."""
+    archive_path = os.path.join(OUTPUT_DIR, archive_name)
+    used = set()
+    with zipfile.ZipFile(archive_path + ".tmp", "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for index, (arcname, url) in enumerate(midi_urls):
+            if arcname in used:
+                # two inputs with the same name: keep both
+                arcname = f"{index}_{arcname}"
+            used.add(arcname)
+            midi_path = materialize_midi(os.path.basename(url))
+            if midi_path:
+                zf.write(midi_path, arcname=arcname)
+    os.replace(archive_path + ".tmp", archive_path)
+    return f"/outputs/{archive_name}"
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def default_params() -> dict:
+    """Deployment-wide processing parameters (before per-request options)."""
+    return processing_params(block_seconds=TRANSCRIBE_BLOCK_SECONDS,
+                             overlap_seconds=TRANSCRIBE_BLOCK_OVERLAP,
+                             engine=PITCH_ENGINE,
+                             silence_db=SILENCE_GATE_DB,
+                             **quality_params(TRANSCRIBE_QUALITY))
+
+
+def resolve_options(engine: Optional[str] = None, quality: Optional[str] = None) -> dict:
+    """Validate per-request processing overrides; returns a dict for transcribe()."""
+    options = {}
+    if quality:
+        if quality not in QUALITY_TIERS:
+            raise HTTPException(status_code=400,
+                                detail=f"Unknown quality '{quality}' (available: {', '.join(QUALITY_TIERS)})")
+        options.update(quality_params(quality))
+    if engine:
+        if engine not in PITCH_ENGINES:
+            raise HTTPException(status_code=400,
+                                detail=f"Unknown engine '{engine}' (available: {', '.join(PITCH_ENGINES)})")
+        options["engine"] = engine
+    return options
+
+
+def normalize_events(events_raw):
     # normalize events to list of dicts {note, start, end}
     events = []
     for item in events_raw:
@@ -90,50 +356,675 @@ async def trans(file: UploadFile = File(...)):
         else:
             continue
         events.append({"note": str(note), "start": float(t0), "end": float(t1)})
+    return events
+
+
+def midi_name_for(fname: str) -> str:
+    return f"{os.path.splitext(fname)[0]}.mid"
+
+
+def _events_path(midi_name: str) -> str:
+    return os.path.join(OUTPUT_DIR, f"{os.path.splitext(midi_name)[0]}.events.json")
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    # unique temp name so concurrent writers of the same output never see a partial file
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
 
-    # build transcription_text (durations)
-    text_parts = []
-    for e in events:
-        dur = e["end"] - e["start"]
-        text_parts.append(f"{e['note']}({dur:.3f}s)")
-    text_output = " ".join(text_parts)
 
-    # write midi if pretty_midi object present
-    midi_name = f"{os.path.splitext(fname)[0]}.mid"
+async def store_midi(events, fname: str):
+    """Persist the MIDI for a result according to MIDI_MODE; return its URL or None."""
+    midi_name = midi_name_for(fname)
+    started = time.perf_counter()
+    try:
+        if MIDI_MODE == "lazy":
+            await run_in_threadpool(_write_atomic, _events_path(midi_name), json.dumps(events).encode("utf-8"))
+            midi_write_hist.observe(time.perf_counter() - started)
+            return f"{API_PREFIX}/trans/midi/{midi_name}"
+        # serialized in memory (no pretty_midi), then written off the event loop
+        data = events_to_midi_bytes(events)
+        midi_path = os.path.join(OUTPUT_DIR, midi_name)
+        await run_in_threadpool(_write_atomic, midi_path, data)
+        midi_write_hist.observe(time.perf_counter() - started)
+        logger.info("Wrote MIDI to %s", midi_path)
+        return f"/outputs/{midi_name}"
+    except OSError:
+        logger.exception("Failed to write MIDI file for %s", fname)
+        return None
+
+
+def materialize_midi(midi_name: str):
+    """Path of an output MIDI, built from its stored events if needed; None if unknown. Runs in a thread."""
+    midi_path = os.path.join(OUTPUT_DIR, midi_name)
+    if os.path.isfile(midi_path):
+        return midi_path
+    events_path = _events_path(midi_name)
+    if not os.path.isfile(events_path):
+        return None
+    started = time.perf_counter()
+    with open(events_path, "r", encoding="utf-8") as f:
+        events = json.load(f)
+    _write_atomic(midi_path, events_to_midi_bytes(events))
+    midi_write_hist.observe(time.perf_counter() - started)
+    logger.info("Built MIDI %s on first request", midi_path)
+    return midi_path
+
+
+def link_cached_midi(cached_path: str, fname: str):
+    """Expose a cached MIDI under this upload's output name (hard link when possible). Runs in a thread."""
+    midi_name = midi_name_for(fname)
     midi_path = os.path.join(OUTPUT_DIR, midi_name)
-    midi_rel_url = None
-    if pm is not None:
+    try:
         try:
-            pm.write(midi_path)
-            # ensure file exists on disk
-            timeout = 3.0
-            waited = 0.0
-            while not os.path.isfile(midi_path) and waited < timeout:
-                time.sleep(0.05)
-                waited += 0.05
-            if os.path.isfile(midi_path):
-                midi_rel_url = f"/outputs/{midi_name}"
-                logger.info("Wrote MIDI to %s", midi_path)
-            else:
-                logger.warning("MIDI write attempted but file not found after waiting")
-        except Exception as e:
-            logger.exception("Failed to write MIDI file: %s", e)
-            midi_rel_url = None
+            os.link(cached_path, midi_path)
+            # the link shares the cache entry's mtime; the storage sweep must age it from now
+            os.utime(midi_path)
+        except OSError:
+            shutil.copyfile(cached_path, midi_path)
+    except FileNotFoundError:
+        # evicted from the cache since get(); the caller writes it from the events
+        return None
+    except OSError:
+        logger.exception("Failed to copy cached MIDI %s", cached_path)
+        return None
+    return f"/outputs/{midi_name}"
 
-    response = {
+
+def build_response(events, midi_rel_url) -> dict:
+    # transcription_text is added by render_result() when the client wants it
+    return {
         "success": True,
-        "transcription_text": text_output,
         "events": events,   # normalized events as list of dicts
         "midi_file": midi_rel_url
     }
-    return response
+
+
+async def transcribe(fpath: str, fname: str, content_hash: str, progress=None, options=None,
+                     shed: bool = True) -> dict:
+    """Run the full pipeline on a saved upload and build the /trans response payload.
+
+    ``progress`` is an optional callable receiving a fraction in [0, 1];
+    ``options`` are processing overrides from resolve_options(). With
+    ``shed`` the request may be rejected with Overloaded when admission
+    control is saturated; otherwise it waits for a slot.
+    Processing errors propagate to the caller.
+    """
+    started = time.perf_counter()
+    outcome = "error"
+    with in_flight_gauge.track_inprogress():
+        try:
+            result, outcome = await _transcribe(fpath, fname, content_hash, progress, options, shed)
+        finally:
+            transcription_hist.observe(time.perf_counter() - started, outcome=outcome)
+    return result
+
+
+async def _transcribe(fpath, fname, content_hash, progress, options, shed):
+    # returns (response payload, metrics outcome label)
+    params = default_params()
+    params.update(options or {})
+    cache_key = make_key(content_hash, params)
+    cached = await run_in_threadpool(result_cache.get, cache_key)
+    if cached is not None:
+        events, cached_midi = cached
+        logger.info("Result cache hit for %s", fname)
+        if progress:
+            progress(1.0)
+        midi_rel_url = None
+        if cached_midi:
+            midi_rel_url = await run_in_threadpool(link_cached_midi, cached_midi, fname)
+        if midi_rel_url is None:
+            midi_rel_url = await store_midi(events, fname)
+        return build_response(events, midi_rel_url), "cache_hit"
+
+    if progress:
+        progress(0.1)
+    # identical requests arriving while this one runs (double clicks, retries) wait for it
+    # instead of transcribing the same audio again; they share its events and MIDI URL
+    while True:
+        try:
+            (result, work_seconds), shared = await inflight.do(
+                cache_key, lambda: _compute(fpath, fname, params, cache_key, progress, shed))
+            break
+        except Overloaded:
+            # a call that is never shed only gets this from a sheddable flight it joined:
+            # that flight is gone now, so try again (and wait for a slot of its own)
+            if shed:
+                raise
+            logger.info("Coalesced transcription of %s was shed; retrying", fname)
+    if shared:
+        logger.info("Coalesced %s with a running identical transcription", fname)
+        coalesced_counter.inc()
+        coalesced_work_counter.inc(work_seconds)
+        if progress:
+            progress(1.0)
+        return dict(result), "coalesced"
+    return result, "ok"
+
+
+async def _compute(fpath, fname, params, cache_key, progress, shed):
+    # cache miss: returns (response payload, seconds of pipeline work it took)
+    duration = await run_in_threadpool(audio_seconds, fpath)
+    waiting = time.perf_counter()
+    async with admission.slot(duration, shed=shed):
+        admission_wait_hist.observe(time.perf_counter() - waiting, lane=admission.lane(duration))
+        # run in the process pool so pYIN does not block the event loop; workers decode from the file
+        # and only send the events back (the MIDI is serialized here, or lazily on download)
+        (events_raw, stats), queue_wait = await run_in_pool_timed(extract_events_timed, fpath, **params)
+    queue_wait_hist.observe(queue_wait, queue="pool")
+    audio_duration_hist.observe(stats["audio_seconds"])
+    for stage, seconds in stats["stages"].items():
+        stage_hist.observe(seconds, stage=stage)
+    if progress:
+        progress(0.8)
+
+    events = normalize_events(events_raw)
+    midi_rel_url = await store_midi(events, fname)
+    midi_path = os.path.join(OUTPUT_DIR, midi_name_for(fname))
+    await run_in_threadpool(result_cache.put, cache_key, events,
+                            midi_path if MIDI_MODE == "eager" and midi_rel_url else None)
+    if progress:
+        progress(1.0)
+
+    return build_response(events, midi_rel_url), sum(stats["stages"].values())
+
+
+async def _run_job(job, progress):
+    # updated_at of a queued job is when it was (re)queued
+    queue_wait_hist.observe(max(0.0, time.time() - job["updated_at"]), queue="jobs")
+    content_hash = await run_in_threadpool(hash_file, job["upload_path"])
+    # durable jobs are never shed: they wait for a slot
+    return await transcribe(job["upload_path"], job["filename"], content_hash,
+                            progress=progress, options=job["params"], shed=False)
+
+
+job_store = JobStore(JOBS_DB)
+inflight = SingleFlight()
+admission = AdmissionController(ADMISSION_MAX_CONCURRENT, ADMISSION_MAX_QUEUE,
+                                max_queued_audio=ADMISSION_MAX_QUEUED_AUDIO_SECONDS,
+                                queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+                                fast_seconds=FAST_LANE_MAX_SECONDS, fast_slots=FAST_LANE_SLOTS,
+                                on_reject=lambda reason: admission_rejected_counter.inc(reason=reason))
+storage = StorageManager(
+    UPLOAD_DIR, OUTPUT_DIR, os.path.join(UPLOAD_DIR, "archive"),
+    upload_max_age=UPLOAD_MAX_AGE_HOURS * 3600, output_max_age=OUTPUT_MAX_AGE_HOURS * 3600,
+    upload_quota=int(UPLOAD_QUOTA_MB * 1024 * 1024), output_quota=int(OUTPUT_QUOTA_MB * 1024 * 1024),
+    archive=UPLOAD_ARCHIVE, archive_quota=int(ARCHIVE_QUOTA_MB * 1024 * 1024),
+    # queued jobs must keep their upload; the job database itself may live in UPLOAD_DIR
+    protect=job_store.active_upload_paths,
+    exclude={os.path.basename(JOBS_DB) + suffix for suffix in ("", "-wal", "-shm", "-journal")},
+)
+job_runner = JobRunner(job_store, _run_job, workers=JOB_WORKERS, fast_workers=FAST_LANE_SLOTS,
+                       fast_seconds=FAST_LANE_MAX_SECONDS)
+
+
+@router.post("/trans")
+async def trans(file: UploadFile = File(...), engine: Optional[str] = Query(None),
+                quality: Optional[str] = Query(None), text: bool = Query(True),
+                accept: Optional[str] = Header(None)):
+    """Transcribe one upload.
+
+    Send ``Accept: application/msgpack`` for columnar binary events and
+    ``?text=false`` to skip ``transcription_text``.
+    """
+    check_audio_filename(file.filename)
+    options = resolve_options(engine, quality)
+    # before the upload and the transcription, not after them
+    check_accept(accept)
+
+    # shed (if at all) inside transcribe(), after the cache probe: cache hits need no slot
+    fname, fpath, content_hash = await save_upload(file)
+
+    try:
+        result = await transcribe(fpath, fname, content_hash, options=options)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error extracting notes")
+        raise HTTPException(status_code=500, detail=f"Processing error: {e}")
+    return render_result(result, accept, include_text=text)
+
+
+@router.post("/trans/batch")
+async def trans_batch(files: List[UploadFile] = File(...), engine: Optional[str] = Query(None),
+                      quality: Optional[str] = Query(None)):
+    """Transcribe several audio files (or zip archives of them) in parallel.
+
+    Streams newline-delimited JSON: one ``result``/``error`` line per file in
+    completion order, then a ``done`` line with a zip of all MIDI outputs.
+    """
+    options = resolve_options(engine, quality)
+    # admitted as a whole: its files then wait for slots instead of being shed one by one
+    admission.check()
+
+    # (name, stored name, path, hash) for accepted files, (name, error) for rejected ones;
+    # the file limit is enforced before each upload or zip is stored, and stored files may be
+    # shared with other requests (dedup), so a rejected batch leaves them to the storage sweep
+    items = []
+
+    def room() -> int:
+        return MAX_BATCH_FILES - sum(1 for item in items if len(item) == 4)
+
+    for upload in files:
+        if upload.filename and upload.filename.lower().endswith(".zip"):
+            # the zip itself is only unpacked and removed, so keep it out of the dedup store
+            try:
+                _, zip_path, _ = await save_upload(upload, dedup=False)
+            except HTTPException as e:
+                items.append((upload.filename, e.detail))
+                continue
+            try:
+                items.extend(await run_in_threadpool(extract_zip_uploads, zip_path, room()))
+            except zipfile.BadZipFile:
+                items.append((upload.filename, "Invalid zip archive"))
+            finally:
+                os.remove(zip_path)
+        else:
+            try:
+                check_audio_filename(upload.filename)
+            except HTTPException as e:
+                items.append((upload.filename, e.detail))
+                continue
+            if room() <= 0:
+                raise HTTPException(status_code=413, detail=f"Too many files in batch (max {MAX_BATCH_FILES})")
+            try:
+                items.append((upload.filename, *await save_upload(upload)))
+            except HTTPException as e:
+                # e.g. 413 for one oversized file: reported on its line, the rest still runs
+                items.append((upload.filename, e.detail))
+    accepted = [item for item in items if len(item) == 4]
+
+    async def run_one(name, fname, fpath, content_hash):
+        try:
+            return name, await transcribe(fpath, fname, content_hash, options=options, shed=False), None
+        except Exception as e:
+            logger.exception("Error extracting notes from %s", name)
+            return name, None, f"Processing error: {e}"
+
+    async def stream():
+        for item in items:
+            if len(item) == 2:
+                yield json.dumps({"type": "error", "file": item[0], "detail": item[1]}) + "\n"
+        tasks = [asyncio.ensure_future(run_one(*item)) for item in accepted]
+        midi_urls = []
+        failed = sum(1 for item in items if len(item) == 2)
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                name, result, error = await next_done
+                if error is not None:
+                    failed += 1
+                    yield json.dumps({"type": "error", "file": name, "detail": error}) + "\n"
+                    continue
+                if result["midi_file"]:
+                    midi_urls.append((f"{os.path.splitext(name)[0]}.mid", result["midi_file"]))
+                yield json.dumps({"type": "result", "file": name, **result}) + "\n"
+        finally:
+            # client went away: stop scheduling the remaining work
+            for task in tasks:
+                task.cancel()
+
+        archive_url = None
+        if midi_urls:
+            archive_url = await run_in_threadpool(build_midi_archive, midi_urls, f"batch_{uuid.uuid4().hex}.zip")
+        yield json.dumps({
+            "type": "done",
+            "count": len(items),
+            "succeeded": len(items) - failed,
+            "failed": failed,
+            "archive": archive_url,
+        }) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@router.post("/trans/jobs", status_code=202)
+async def create_trans_job(file: UploadFile = File(...), engine: Optional[str] = Query(None),
+                           quality: Optional[str] = Query(None)):
+    """Queue a transcription and return immediately with a job id to poll."""
+    check_audio_filename(file.filename)
+    options = resolve_options(engine, quality)
+
+    fname, fpath, _ = await save_upload(file)
+    duration = await run_in_threadpool(audio_seconds, fpath)
+    job_id = job_store.create(fname, fpath, params=options, audio_seconds=duration)
+    job_runner.notify()
+    return {
+        "success": True,
+        "job_id": job_id,
+        "status": JOB_QUEUED,
+        "status_url": f"{API_PREFIX}/trans/jobs/{job_id}",
+    }
+
+
+@router.post("/trans/preview", status_code=202)
+async def create_trans_preview(file: UploadFile = File(...), engine: Optional[str] = Query(None),
+                               quality: Optional[str] = Query(None), text: bool = Query(True),
+                               accept: Optional[str] = Header(None)):
+    """Quick coarse transcription now, full resolution in the background.
+
+    Transcribes the first PREVIEW_SECONDS with PREVIEW_PARAMS, waiting at most
+    PREVIEW_BUDGET_SECONDS, then queues the full pass as a job. The response
+    is the job's status document: ``status_url`` shows the preview (marked
+    ``"preview": true``) until the full result replaces it there. Without a
+    preview in time the job is returned on its own.
+    """
+    check_audio_filename(file.filename)
+    options = resolve_options(engine, quality)
+    # before the upload and the transcription, not after them
+    check_accept(accept)
+
+    fname, fpath, content_hash = await save_upload(file)
+    preview_options = {**options, **PREVIEW_PARAMS, "max_seconds": PREVIEW_SECONDS}
+    preview = None
+    try:
+        # separate output name: files under /outputs are immutable once written
+        preview = await asyncio.wait_for(transcribe(fpath, f"preview_{fname}", content_hash,
+                                                    options=preview_options),
+                                         timeout=PREVIEW_BUDGET_SECONDS)
+    except asyncio.TimeoutError:
+        # the pool task cannot be interrupted; it finishes in the background and is cached
+        logger.info("Preview of %s missed its %.1f s budget", fname, PREVIEW_BUDGET_SECONDS)
+    except Overloaded:
+        logger.info("No preview of %s: service saturated", fname)
+    except Exception:
+        logger.exception("Preview failed for %s", fname)
+
+    duration = await run_in_threadpool(audio_seconds, fpath)
+    job_id = job_store.create(fname, fpath, params=options, preview=preview, audio_seconds=duration)
+    job_runner.notify()
+    response = job_store.to_response(job_store.get(job_id))
+    response.update(success=True, status_url=f"{API_PREFIX}/trans/jobs/{job_id}")
+    rendered = render_result(response, accept, include_text=text)
+    rendered.status_code = 202
+    return rendered
+
+
+async def pitch_block_in_pool(window, sr_native: int, sr: int, offset: int, n_core: int, params: dict,
+                              lane: str):
+    """processing.pitch_block on the pool, handing the window over in shared memory.
+
+    Holds an admission slot in ``lane`` while the block runs, so streamed
+    blocks share the workers with whole-file transcriptions instead of
+    queuing in the pool behind (or ahead of) them. The shared block is
+    released once the worker is done, fails or the await is cancelled.
+    """
+    audio = n_core * params["hop_length"] / sr
+    async with admission.slot(audio, shed=False, lane=lane):
+        with SharedAudio.from_array(window) as block:
+            return await run_in_pool(pitch_block_shared, block.ref, sr_native, sr, offset, n_core, params)
+
+
+STREAM_ENCODINGS = {"f32": "<f4", "s16": "<i2"}
+
+
+@router.websocket("/trans/stream")
+async def trans_stream(websocket: WebSocket, sample_rate: int = 44100, channels: int = 1,
+                       encoding: str = "f32", engine: Optional[str] = None, quality: Optional[str] = None):
+    """Live transcription of interleaved little-endian PCM sent as binary messages.
+
+    Query parameters describe the stream (``encoding`` is f32 or s16). The
+    server answers with JSON messages: ``ready`` once, ``note`` for every note
+    as soon as it is final, and ``done`` after the client sends the text
+    message ``end``.
+
+    Each block takes a long-lane admission slot while it is pitch-tracked,
+    so streams never use the slots reserved for short clips. New streams are
+    refused with close code 1013 while admission is saturated. Open streams
+    count as transcriptions in flight.
+    """
+    await websocket.accept()
+    try:
+        options = resolve_options(engine, quality)
+        if encoding not in STREAM_ENCODINGS:
+            raise HTTPException(status_code=400, detail=f"Unknown encoding '{encoding}' (available: f32, s16)")
+        if not (1 <= channels <= 8) or not (4000 <= sample_rate <= 192000):
+            raise HTTPException(status_code=400, detail="Unsupported sample_rate/channels")
+    except HTTPException as e:
+        await websocket.send_json({"type": "error", "detail": e.detail})
+        await websocket.close(code=1008)
+        return
+
+    params = default_params()
+    params.update(options)
+    params.update(block_seconds=STREAM_BLOCK_SECONDS, overlap_seconds=STREAM_OVERLAP_SECONDS)
+    dtype = np.dtype(STREAM_ENCODINGS[encoding])
+    scale = 1.0 / 32768 if encoding == "s16" else 1.0
+    frame_bytes = dtype.itemsize * channels
+    streamer = StreamingTranscriber(sample_rate, params)
+    pending = b""
+    n_events = 0
+
+    async def drain():
+        nonlocal n_events
+        while (block := streamer.next_block()) is not None:
+            window, offset, n_core, first_frame = block
+            f0, voiced_flag = await pitch_block_in_pool(window, sample_rate, streamer.sr, offset, n_core, params,
+                                                        lane=LONG_LANE)
+            for note, t0, t1 in streamer.accept(f0, voiced_flag, first_frame):
+                await websocket.send_json({"type": "note", "note": note, "start": t0, "end": t1})
+                n_events += 1
+
+    # no slot per open stream (it would sit idle between blocks); blocks take one each (drain)
+    if admission.saturated:
+        await websocket.send_json({"type": "error", "detail": "Service saturated; retry later",
+                                   "retry_after": admission.retry_after()})
+        await websocket.close(code=1013)
+        return
+    await websocket.send_json({
+        "type": "ready",
+        "sample_rate": sample_rate,
+        "analysis_sample_rate": streamer.sr,
+        "latency_seconds": STREAM_BLOCK_SECONDS + STREAM_OVERLAP_SECONDS,
+    })
+    in_flight_gauge.inc()
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("text") is not None:
+                # control messages: "end" or {"type": "end"}; anything else is ignored
+                text = message["text"].strip()
+                try:
+                    control = json.loads(text).get("type") if text.startswith("{") else text.lower()
+                except ValueError:
+                    control = None
+                if control == "end":
+                    break
+                continue
+            pending += message.get("bytes") or b""
+            usable = len(pending) - len(pending) % frame_bytes
+            if usable:
+                pcm = np.frombuffer(pending[:usable], dtype=dtype).reshape(-1, channels)
+                pending = pending[usable:]
+                samples = pcm.mean(axis=1, dtype=np.float32) if channels > 1 else pcm[:, 0].astype(np.float32)
+                if scale != 1.0:
+                    samples *= np.float32(scale)
+                streamer.add(samples)
+                if streamer.duration > STREAM_MAX_SECONDS:
+                    await websocket.send_json({"type": "error",
+                                               "detail": f"Stream longer than {STREAM_MAX_SECONDS:g} s"})
+                    await websocket.close(code=1009)
+                    return
+            await drain()
+
+        streamer.finish()
+        await drain()
+        for note, t0, t1 in streamer.flush():
+            await websocket.send_json({"type": "note", "note": note, "start": t0, "end": t1})
+            n_events += 1
+        await websocket.send_json({"type": "done", "events": n_events, "duration": streamer.duration})
+        await websocket.close()
+    except WebSocketDisconnect:
+        logger.info("Streaming client disconnected")
+    finally:
+        in_flight_gauge.dec()
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def progressive_params(options=None) -> dict:
+    params = default_params()
+    params.update(options or {})
+    params.update(block_seconds=SSE_BLOCK_SECONDS)
+    return params
+
+
+async def transcribe_progressive(fpath: str, fname: str, content_hash: str, options=None):
+    """Block-wise transcription of a saved upload as an async generator.
+
+    Yields ``(event, data)`` pairs: ``progress`` after every block,
+    ``notes`` with the events that became final in it, then ``done`` with the
+    MIDI URL. Blocks of SSE_BLOCK_SECONDS are pitch-tracked in parallel on
+    the process pool and reported in order.
+    """
+    params = progressive_params(options)
+    cache_key = make_key(content_hash, params)
+    cached = await run_in_threadpool(result_cache.get, cache_key)
+    if cached is not None:
+        events, cached_midi = cached
+        midi_rel_url = None
+        if cached_midi:
+            midi_rel_url = await run_in_threadpool(link_cached_midi, cached_midi, fname)
+        if midi_rel_url is None:
+            midi_rel_url = await store_midi(events, fname)
+        yield "progress", {"progress": 1.0}
+        yield "notes", {"events": events}
+        yield "done", {"success": True, "events": len(events), "midi_file": midi_rel_url, "cached": True}
+        return
+
+    snd = await run_in_threadpool(sf.SoundFile, fpath)
+    try:
+        streamer = StreamingTranscriber(snd.samplerate, params)
+        duration = snd.frames / snd.samplerate
+        audio_duration_hist.observe(duration)
+        chunk_frames = max(1, int(SSE_BLOCK_SECONDS * snd.samplerate))
+        pending = collections.deque()  # (first_frame, n_core, pool task), oldest first
+        events = []
+        reading = True
+        # blocks run in parallel on as many workers as the recording's lane may use, each holding
+        # an admission slot of that lane while on a worker; the response is already under way
+        # (200), so they wait for slots instead of being shed (see trans_sse)
+        lane = admission.lane(duration)
+        parallel = min(TRANSCRIBE_WORKERS, admission.lane_slots(duration))
+        try:
+            while True:
+                block = streamer.next_block()
+                if block is None and reading:
+                    chunk = await run_in_threadpool(snd.read, chunk_frames, dtype="float32", always_2d=True)
+                    if len(chunk):
+                        streamer.add(chunk.mean(axis=1) if chunk.shape[1] > 1 else chunk[:, 0])
+                    else:
+                        streamer.finish()
+                        reading = False
+                    continue
+                if block is not None:
+                    window, offset, n_core, first_frame = block
+                    task = asyncio.ensure_future(pitch_block_in_pool(window, snd.samplerate, streamer.sr,
+                                                                     offset, n_core, params, lane))
+                    pending.append((first_frame, n_core, task))
+                    if len(pending) < parallel:
+                        continue
+                if not pending:
+                    break
+                first_frame, n_core, task = pending.popleft()
+                f0, voiced_flag = await task
+                notes = normalize_events(streamer.accept(f0, voiced_flag, first_frame))
+                done_seconds = min(duration, (first_frame + n_core) * streamer.hop_length / streamer.sr)
+                events.extend(notes)
+                yield "progress", {"progress": done_seconds / duration if duration else 1.0,
+                                   "processed_seconds": done_seconds, "duration": duration}
+                if notes:
+                    yield "notes", {"events": notes}
+        finally:
+            # client went away or failed: drop blocks still queued (their slots and shared memory)
+            for _, _, task in pending:
+                task.cancel()
+    finally:
+        await run_in_threadpool(snd.close)
+
+    tail = normalize_events(streamer.flush())
+    events.extend(tail)
+    if tail:
+        yield "notes", {"events": tail}
+    midi_rel_url = await store_midi(events, fname)
+    midi_path = os.path.join(OUTPUT_DIR, midi_name_for(fname))
+    await run_in_threadpool(result_cache.put, cache_key, events,
+                            midi_path if MIDI_MODE == "eager" and midi_rel_url else None)
+    yield "done", {"success": True, "events": len(events), "midi_file": midi_rel_url}
+
+
+@router.post("/trans/sse")
+async def trans_sse(file: UploadFile = File(...), engine: Optional[str] = Query(None),
+                    quality: Optional[str] = Query(None)):
+    """Transcribe one upload, streaming Server-Sent Events while it runs.
+
+    Events: ``progress`` ({progress, processed_seconds, duration}) per block,
+    ``notes`` ({events: [...]}) as soon as notes are final, then ``done``
+    ({success, events, midi_file}) or ``error`` ({detail}).
+    """
+    check_audio_filename(file.filename)
+    options = resolve_options(engine, quality)
+    fname, fpath, content_hash = await save_upload(file)
+    # shed with a real status code while one is still possible (the stream itself waits for a
+    # slot); cached results need no slot
+    if not result_cache.contains(make_key(content_hash, progressive_params(options))):
+        admission.check(await run_in_threadpool(audio_seconds, fpath))
+
+    async def stream():
+        started = time.perf_counter()
+        outcome = "error"
+        with in_flight_gauge.track_inprogress():
+            try:
+                async for event, data in transcribe_progressive(fpath, fname, content_hash, options):
+                    if event == "done":
+                        outcome = "cache_hit" if data.pop("cached", False) else "ok"
+                    yield sse_event(event, data)
+            except Exception as e:
+                logger.exception("Error extracting notes")
+                yield sse_event("error", {"detail": f"Processing error: {e}"})
+            finally:
+                transcription_hist.observe(time.perf_counter() - started, outcome=outcome)
+
+    # no-cache / X-Accel-Buffering keep proxies from holding events back
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.get("/trans/jobs/{job_id}")
+def get_trans_job(request: Request, job_id: str, text: bool = Query(True), accept: Optional[str] = Header(None)):
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    # pollers that send If-None-Match get a bodiless 304 until the job changes
+    return conditional_response(render_result(job_store.to_response(job), accept, include_text=text),
+                                request.headers)
+
 
 @router.get("/trans/midi/{midi_filename}")
-def get_midi(midi_filename: str):
-    path = os.path.join(OUTPUT_DIR, midi_filename)
-    if not os.path.isfile(path):
+async def get_midi(request: Request, midi_filename: str):
+    midi_filename = os.path.basename(midi_filename)
+    path = await run_in_threadpool(materialize_midi, midi_filename)
+    if path is None:
         raise HTTPException(status_code=404, detail="MIDI not found")
-    return FileResponse(path, media_type="audio/midi", filename=midi_filename)
+    return await run_in_threadpool(output_file_response, path, request.headers,
+                                   media_type="audio/midi", filename=midi_filename)
+
+
+@router.get("/storage/stats")
+async def get_storage_stats():
+    """File counts and bytes of uploads/outputs (and archive), dedup savings and the last sweep."""
+    return await run_in_threadpool(storage.stats)
+
+
+@router.get("/trans/cache/stats")
+def cache_stats():
+    return dict(result_cache.stats(), coalescing=inflight.stats())
 
 
 # health and readiness endpoints (root-level)
@@ -142,10 +1033,61 @@ def health_check():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+def metrics():
+    shared_audio_gauge.set(shared_audio_stats()["bytes"])
+    for lane, occupancy in admission.stats()["lanes"].items():
+        admission_gauge.set(occupancy["active"], kind="active", lane=lane)
+        admission_gauge.set(occupancy["queued"], kind="queued", lane=lane)
+    admission_gauge.set(admission.queued_audio, kind="queued_audio_seconds", lane="all")
+    return Response(metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+
 @app.get("/ready")
 def readiness_check():
-    # could include checks for disk, model load, etc. For now return healthy.
-    return {"status": "ready"}
+    if not warmup_state["done"]:
+        return JSONResponse(status_code=503, content={"status": "warming_up", "warmup": warmup_state,
+                                                      "admission": admission.stats()})
+    if admission.saturated:
+        # let the load balancer route new uploads to replicas with room
+        return JSONResponse(status_code=503, content={"status": "saturated", "warmup": warmup_state,
+                                                      "admission": admission.stats()},
+                            headers={"Retry-After": str(admission.retry_after())})
+    return {"status": "ready", "warmup": warmup_state, "admission": admission.stats()}
+
+
+warmup_state = {"done": not TRANSCRIBE_WARMUP, "workers": 0, "seconds": None}
+if TRANSCRIBE_WARMUP:
+    # the preview configuration uses another engine (YIN), which needs its own compilation
+    set_worker_initializer(warm_up_worker, default_params(), dict(default_params(), **PREVIEW_PARAMS))
+
+
+async def _warm_up_workers():
+    started = time.time()
+    try:
+        warmup_state["workers"] = await start_all_workers()
+    except Exception:
+        logger.exception("Worker warm-up failed")
+    warmup_state["seconds"] = round(time.time() - started, 3)
+    warmup_state["done"] = True
+    logger.info("Warmed up %d transcription workers in %.1fs", warmup_state["workers"], warmup_state["seconds"])
+
+
+@app.on_event("startup")
+async def start_job_workers():
+    if TRANSCRIBE_WARMUP:
+        # in the background, so /health answers while workers compile
+        app.state.warmup_task = asyncio.create_task(_warm_up_workers())
+    job_runner.start()
+    if STORAGE_SWEEP_INTERVAL > 0:
+        storage.start(STORAGE_SWEEP_INTERVAL)
+
+
+@app.on_event("shutdown")
+async def stop_workers():
+    await storage.stop()
+    await job_runner.stop()
+    shutdown_executor(wait=False)
 
 
 # include router under configured prefix (empty string or "/api/v1" etc.)
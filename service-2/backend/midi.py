@@ -0,0 +1,80 @@
+import re
+import struct
+from functools import lru_cache
+from typing import Iterable
+
+_NOTE_OFFSETS = {'C': 0, 'D': 2, 'E': 4, 'F': 5, 'G': 7, 'A': 9, 'B': 11}
+_NOTE_RE = re.compile(r'^([A-Ga-g])([#b]?)(-?\d+)$')
+
+# same defaults pretty_midi uses, so files match what the service produced before
+DEFAULT_RESOLUTION = 220
+DEFAULT_TEMPO = 120.0
+
+
+@lru_cache(maxsize=512)
+def note_name_to_number(name: str) -> int:
+    """'C4' -> 60, 'C#-1' -> 1 (inverse of processing.midi_to_note_name)."""
+    m = _NOTE_RE.match(name.strip())
+    if not m:
+        raise ValueError(f"Invalid note name {name!r}")
+    letter, accidental, octave = m.groups()
+    number = _NOTE_OFFSETS[letter.upper()] + (int(octave) + 1) * 12
+    number += 1 if accidental == '#' else -1 if accidental == 'b' else 0
+    if not 0 <= number <= 127:
+        raise ValueError(f"Note {name!r} out of MIDI range")
+    return number
+
+
+def _vlq(value: int) -> bytes:
+    # MIDI variable-length quantity
+    out = [value & 0x7F]
+    value >>= 7
+    while value:
+        out.append(0x80 | (value & 0x7F))
+        value >>= 7
+    return bytes(reversed(out))
+
+
+def _track(events) -> bytes:
+    """events: iterable of (tick, raw message bytes), already sorted."""
+    body = bytearray()
+    last = 0
+    for tick, message in events:
+        body += _vlq(tick - last)
+        body += message
+        last = tick
+    body += b'\x00\xff\x2f\x00'  # end of track
+    return b'MTrk' + struct.pack('>I', len(body)) + bytes(body)
+
+
+def events_to_midi_bytes(events: Iterable, velocity: int = 100, program: int = 0,
+                         resolution: int = DEFAULT_RESOLUTION, tempo: float = DEFAULT_TEMPO) -> bytes:
+    """Serialize note events to a format-1 Standard MIDI File in memory.
+
+    ``events`` are dicts {note, start, end} (as returned by /trans) or
+    (note, start, end) tuples, with ``note`` a name ('A4') or MIDI number.
+    """
+    ticks_per_second = resolution * tempo / 60.0
+    messages = []
+    for item in events:
+        if isinstance(item, dict):
+            note, start, end = item["note"], item["start"], item["end"]
+        else:
+            note, start, end = item[0], item[1], item[2]
+        try:
+            pitch = note if isinstance(note, int) else note_name_to_number(str(note))
+        except ValueError:
+            continue
+        on = int(round(float(start) * ticks_per_second))
+        off = max(on, int(round(float(end) * ticks_per_second)))
+        # note-offs sort before note-ons at the same tick so repeated pitches retrigger cleanly
+        messages.append((on, 1, bytes((0x90, pitch, velocity))))
+        messages.append((off, 0, bytes((0x80, pitch, 0))))
+    messages.sort(key=lambda m: (m[0], m[1]))
+
+    mpqn = int(round(60_000_000 / tempo))
+    tempo_track = _track([(0, b'\xff\x51\x03' + mpqn.to_bytes(3, 'big'))])
+    note_track = _track([(0, bytes((0xC0, program)))] + [(tick, msg) for tick, _, msg in messages])
+    header = b'MThd' + struct.pack('>IHHH', 6, 1, 2, resolution)
+    return header + tempo_track + note_track
+
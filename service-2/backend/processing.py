@@ -1,5 +1,11 @@
 
 import io
+import os
+import time
+import struct
+import inspect
+import logging
+from contextlib import contextmanager
 import numpy as np
 import librosa
 import soundfile as sf
@@ -16,58 +22,267 @@ def midi_to_note_name(midi: int) -> str:
 def freq_to_midi_note(f):
     return int(np.round(librosa.hz_to_midi(f)))
 
-def extract_notes_from_audio_bytes(wav_bytes: bytes, sr_target=22050,
-                                     fmin=65.41, fmax=1975.53,
-                                     hop_length=512, frame_length=2048) -> Tuple[List[Tuple[str,float,float]], pretty_midi.PrettyMIDI]:
-    """Return events list and PrettyMIDI object.
-    events: list of (note_name, t_start, t_end)
+def quantize_pitch(f0: np.ndarray, voiced_flag: np.ndarray) -> np.ndarray:
+    """Round voiced f0 frames to MIDI note numbers; unvoiced frames become NaN."""
+    f0 = np.asarray(f0, dtype=float)
+    midi_notes = np.full_like(f0, fill_value=np.nan)
+    voiced = np.asarray(voiced_flag, dtype=bool) & ~np.isnan(f0)
+    midi_notes[voiced] = np.round(librosa.hz_to_midi(f0[voiced]))
+    return midi_notes
+
+def _note_runs(midi_notes: np.ndarray):
+    """Return (start, end_exclusive, note) index arrays for runs of identical voiced frames."""
+    n = len(midi_notes)
+    if n == 0:
+        empty = np.empty(0, dtype=int)
+        return empty, empty, empty
+    valid = ~np.isnan(midi_notes)
+    # NaN never equals itself, so map unvoiced frames to a sentinel before diffing
+    filled = np.where(valid, midi_notes, -1.0)
+    run_starts = np.flatnonzero(np.concatenate(([True], filled[1:] != filled[:-1])))
+    run_ends = np.append(run_starts[1:], n)
+    keep = valid[run_starts]
+    run_starts, run_ends = run_starts[keep], run_ends[keep]
+    return run_starts, run_ends, midi_notes[run_starts].astype(int)
+
+def segment_notes(midi_notes: np.ndarray, times: np.ndarray, frame_duration: float) -> List[Tuple[str, float, float]]:
+    """Collapse runs of identical quantized frames into (note_name, t_start, t_end) events."""
+    run_starts, run_ends, notes = _note_runs(midi_notes)
+    t_starts = times[run_starts]
+    t_ends = times[run_ends - 1] + frame_duration
+    return [(midi_to_note_name(int(note)), float(t0), float(t1))
+            for note, t0, t1 in zip(notes, t_starts, t_ends)]
+
+class NoteSegmenter:
+    """Incremental form of segment_notes for frames that arrive in consecutive chunks.
+
+    A note still sounding at the end of a chunk is held open and merged with
+    the next chunk, so feeding a frame sequence in any split gives the same
+    events as segment_notes over the whole sequence.
     """
-    bio = io.BytesIO(wav_bytes)
-    y, sr = sf.read(bio, dtype='float32')
-    # to mono
+
+    def __init__(self, frame_duration: float):
+        self.frame_duration = frame_duration
+        self._note = None
+        self._start = 0.0
+        self._last = 0.0
+
+    def _close(self, events):
+        events.append((midi_to_note_name(self._note), float(self._start),
+                       float(self._last + self.frame_duration)))
+        self._note = None
+
+    def feed(self, midi_notes: np.ndarray, times: np.ndarray) -> List[Tuple[str, float, float]]:
+        """Consume the next chunk of quantized frames; return the events that became final."""
+        events = []
+        n = len(midi_notes)
+        if n == 0:
+            return events
+        run_starts, run_ends, notes = _note_runs(midi_notes)
+        for k, (i, j, note) in enumerate(zip(run_starts, run_ends, notes)):
+            note = int(note)
+            if k == 0 and i == 0 and self._note == note:
+                # the open note continues into this chunk
+                self._last = times[j - 1]
+                continue
+            if self._note is not None:
+                self._close(events)
+            self._note, self._start, self._last = note, times[i], times[j - 1]
+        if self._note is not None and (len(run_ends) == 0 or run_ends[-1] < n):
+            # chunk ends on an unvoiced frame (or had no voiced frames at all)
+            self._close(events)
+        return events
+
+    def flush(self) -> List[Tuple[str, float, float]]:
+        """Close the note still open at the end of the input."""
+        events = []
+        if self._note is not None:
+            self._close(events)
+        return events
+
+def _to_mono(y: np.ndarray) -> np.ndarray:
     if y.ndim > 1:
         y = np.mean(y, axis=1)
-    if sr != sr_target:
-        y = librosa.resample(y, orig_sr=sr, target_sr=sr_target)
-        sr = sr_target
+    return y
 
+def _frame_count(y: np.ndarray, hop_length: int) -> int:
+    # number of centered analysis frames librosa produces for y
+    return 1 + len(y) // hop_length
+
+def _fit_frames(f0, voiced_flag, n_frames):
+    """Trim or pad (as unvoiced) pitch tracks to exactly n_frames."""
+    f0 = np.asarray(f0, dtype=float)[:n_frames]
+    voiced_flag = np.asarray(voiced_flag, dtype=bool)[:n_frames]
+    if len(f0) < n_frames:
+        missing = n_frames - len(f0)
+        f0 = np.concatenate((f0, np.full(missing, np.nan)))
+        voiced_flag = np.concatenate((voiced_flag, np.zeros(missing, dtype=bool)))
+    return f0, voiced_flag
+
+def _pyin_engine(y, sr, fmin, fmax, hop_length, frame_length):
     # pitch tracking using pyin (monophonic melody estimation)
+    f0, voiced_flag, voiced_probs = librosa.pyin(
+        y,
+        fmin=fmin,
+        fmax=fmax,
+        sr=sr,
+        hop_length=hop_length,
+        frame_length=frame_length,
+    )
+    return f0, voiced_flag
+
+# frames quieter than this (dB below the loudest frame) count as unvoiced for plain YIN
+YIN_SILENCE_DB = -40.0
+
+def _yin_engine(y, sr, fmin, fmax, hop_length, frame_length):
+    # plain YIN has no voicing decision or Viterbi smoothing; gate it on frame energy instead
+    f0 = librosa.yin(y, fmin=fmin, fmax=fmax, sr=sr, hop_length=hop_length, frame_length=frame_length)
+    rms = librosa.feature.rms(y=y, frame_length=frame_length, hop_length=hop_length)[0]
+    db = librosa.amplitude_to_db(rms, ref=np.max) if rms.size and rms.max() > 0 else np.full_like(rms, -np.inf)
+    f0, voiced_flag = _fit_frames(f0, db[:len(f0)] > YIN_SILENCE_DB, len(f0))
+    f0[~voiced_flag] = np.nan
+    return f0, voiced_flag
+
+# decimation factor and pitch-bin resolution (semitones) used by the low-resolution pYIN engine
+PYIN_FAST_DECIMATION = 2
+PYIN_FAST_RESOLUTION = 0.25
+
+def _pyin_fast_engine(y, sr, fmin, fmax, hop_length, frame_length):
+    # pYIN at a lower sample rate and a coarser pitch grid; the frame grid in seconds is unchanged
+    factor = PYIN_FAST_DECIMATION
+    n_frames = _frame_count(y, hop_length)
+    if sr // factor <= 2 * fmax or hop_length % factor or frame_length % factor:
+        factor = 1
+    y_dec = librosa.resample(y, orig_sr=sr, target_sr=sr // factor, res_type='polyphase') if factor > 1 else y
+    f0, voiced_flag, voiced_probs = librosa.pyin(
+        y_dec,
+        fmin=fmin,
+        fmax=fmax,
+        sr=sr // factor,
+        hop_length=hop_length // factor,
+        frame_length=frame_length // factor,
+        resolution=PYIN_FAST_RESOLUTION,
+    )
+    return _fit_frames(f0, voiced_flag, n_frames)
+
+# pitch tracking engines selectable per request/deployment; all return (f0, voiced_flag) on the hop grid
+PITCH_ENGINES = {
+    "pyin": _pyin_engine,
+    "yin": _yin_engine,
+    "pyin-fast": _pyin_fast_engine,
+}
+DEFAULT_ENGINE = "pyin"
+
+def get_pitch_engine(name: str):
     try:
-        f0, voiced_flag, voiced_probs = librosa.pyin(
-            y,
-            fmin=fmin,
-            fmax=fmax,
-            sr=sr,
-            hop_length=hop_length,
-            frame_length=frame_length,
-        )
-        times = librosa.frames_to_time(np.arange(len(f0)), sr=sr, hop_length=hop_length)
-    except Exception:
-        # if pyin fails (very short audio or unsupported), return empty results
-        return [], None
+        return PITCH_ENGINES[name]
+    except KeyError:
+        raise ValueError(f"Unknown pitch engine {name!r} (available: {', '.join(PITCH_ENGINES)})") from None
 
-    midi_notes = np.full_like(f0, fill_value=np.nan)
-    for i, (f, v) in enumerate(zip(f0, voiced_flag)):
-        if v and not np.isnan(f):
-            midi_notes[i] = freq_to_midi_note(f)
+# silence gating: context kept around every loud region, and the shortest quiet stretch worth skipping
+SILENCE_PAD_SECONDS = 0.25
+SILENCE_MIN_SECONDS = 1.0
 
-    events = []
-    i = 0
-    n = len(midi_notes)
-    while i < n:
-        if np.isnan(midi_notes[i]):
-            i += 1
+def active_regions(y, sr, hop_length, frame_length, silence_db):
+    """Frame ranges ``[(start, end), ...]`` of ``y`` louder than ``silence_db`` dBFS (RMS).
+
+    Frames are on the centered hop grid used by the pitch engines. Regions are
+    padded by SILENCE_PAD_SECONDS and quiet gaps shorter than
+    SILENCE_MIN_SECONDS are bridged, so only long silences get skipped.
+    """
+    n_frames = _frame_count(y, hop_length)
+    rms = librosa.feature.rms(y=y, frame_length=frame_length, hop_length=hop_length)[0][:n_frames]
+    loud = np.zeros(n_frames, dtype=bool)
+    loud[:len(rms)] = 20 * np.log10(np.maximum(rms, 1e-10)) > silence_db
+    pad = int(np.ceil(SILENCE_PAD_SECONDS * sr / hop_length))
+    min_gap = int(np.ceil(SILENCE_MIN_SECONDS * sr / hop_length))
+    regions = []
+    for start, end in _true_runs(loud):
+        start, end = max(0, start - pad), min(n_frames, end + pad)
+        if regions and start - regions[-1][1] < min_gap:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    return regions
+
+def _true_runs(mask: np.ndarray):
+    # (start, end) index pairs of the runs of True in a boolean array
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.view(np.int8), [0]))))
+    return list(zip(edges[::2].tolist(), edges[1::2].tolist()))
+
+def _track_pitch(y, sr, opts):
+    track = get_pitch_engine(opts["engine"])
+    hop_length, frame_length = opts["hop_length"], opts["frame_length"]
+    silence_db = opts.get("silence_db")
+    if silence_db is None:
+        return track(y, sr, opts["fmin"], opts["fmax"], hop_length, frame_length)
+
+    # only pitch-track the loud regions; silent frames stay unvoiced on the original frame grid
+    n_frames = _frame_count(y, hop_length)
+    regions = active_regions(y, sr, hop_length, frame_length, silence_db)
+    if regions == [(0, n_frames)]:
+        return track(y, sr, opts["fmin"], opts["fmax"], hop_length, frame_length)
+    f0 = np.full(n_frames, np.nan)
+    voiced_flag = np.zeros(n_frames, dtype=bool)
+    for start, end in regions:
+        try:
+            seg_f0, seg_voiced = track(y[start * hop_length:end * hop_length], sr,
+                                       opts["fmin"], opts["fmax"], hop_length, frame_length)
+        except Exception:
+            # region too short for the tracker: leave it unvoiced
             continue
-        note_val = int(midi_notes[i])
-        t_start = float(times[i])
-        j = i + 1
-        while j < n and (not np.isnan(midi_notes[j])) and int(np.round(midi_notes[j])) == note_val:
-            j += 1
-        t_end = float(times[j-1] + (hop_length / sr))
-        events.append((midi_to_note_name(note_val), t_start, t_end))
-        i = j
-
-    # MIDI object
+        f0[start:end], voiced_flag[start:end] = _fit_frames(seg_f0, seg_voiced, end - start)
+    return f0, voiced_flag
+
+# librosa.resample's own default
+DEFAULT_RES_TYPE = "soxr_hq"
+
+def analysis_rate(sr_native: int, sr_target: int, decimate_native: bool = False) -> int:
+    """Sample rate pitch tracking runs at.
+
+    Normally ``sr_target``. With ``decimate_native`` the native rate is divided
+    by the smallest integer factor that brings it to ``sr_target`` or below,
+    so no fractional-ratio resampling is needed (44.1 kHz -> 22050 Hz,
+    48 kHz -> 16 kHz); native rates already at or below ``sr_target`` are kept.
+    """
+    if not decimate_native:
+        return sr_target
+    if sr_native <= sr_target:
+        return sr_native
+    factor = int(np.ceil(sr_native / sr_target))
+    while sr_native % factor:
+        factor += 1
+    return sr_native // factor
+
+def resample(y: np.ndarray, orig_sr: int, target_sr: int, res_type: str = DEFAULT_RES_TYPE) -> np.ndarray:
+    if orig_sr == target_sr:
+        return y
+    return librosa.resample(y, orig_sr=orig_sr, target_sr=target_sr, res_type=res_type)
+
+# named trade-offs between speed and fidelity, applied on top of the defaults
+QUALITY_TIERS = {
+    # cheap polyphase decimation of the native rate, coarse analysis rate and shorter frames
+    "fast": dict(sr_target=16000, hop_length=512, frame_length=1024, res_type="polyphase", decimate_native=True),
+    # integer decimation with a medium-quality resampler; no fractional resampling
+    "balanced": dict(sr_target=22050, hop_length=512, frame_length=2048, res_type="soxr_mq", decimate_native=True),
+    # the historical defaults
+    "accurate": dict(sr_target=22050, hop_length=512, frame_length=2048, res_type=DEFAULT_RES_TYPE,
+                     decimate_native=False),
+}
+
+# coarse settings for quick previews, applied on top of the request's own parameters:
+# low analysis rate, cheap resampling, plain YIN and only the first PREVIEW_SECONDS
+PREVIEW_SECONDS = 30.0
+PREVIEW_PARAMS = dict(sr_target=11025, hop_length=512, frame_length=1024, res_type="polyphase",
+                      decimate_native=True, engine="yin", block_seconds=0, max_seconds=PREVIEW_SECONDS)
+
+def quality_params(tier: str) -> dict:
+    try:
+        return dict(QUALITY_TIERS[tier])
+    except KeyError:
+        raise ValueError(f"Unknown quality tier {tier!r} (available: {', '.join(QUALITY_TIERS)})") from None
+
+def build_midi(events) -> pretty_midi.PrettyMIDI:
     pm = pretty_midi.PrettyMIDI()
     piano = pretty_midi.Instrument(program=0)
     for note_name, t0, t1 in events:
@@ -78,5 +293,409 @@ def extract_notes_from_audio_bytes(wav_bytes: bytes, sr_target=22050,
         note_obj = pretty_midi.Note(velocity=100, pitch=midi_num, start=t0, end=t1)
         piano.notes.append(note_obj)
     pm.instruments.append(piano)
+    return pm
+
+class StageTimer:
+    """Wall-clock seconds spent per pipeline stage (see STAGES) during one extraction."""
+
+    STAGES = ("decode", "resample", "pitch", "segment")
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(self.STAGES, 0.0)
+        self.audio_seconds = 0.0
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - t0
+
+    def as_dict(self) -> dict:
+        return {"audio_seconds": self.audio_seconds, "stages": dict(self.seconds)}
+
+def pitch_block(y_native: np.ndarray, sr_native: int, sr: int, offset: int, n_core: int, opts: dict,
+                timer: StageTimer = None):
+    """Resample and pitch-track one block window, keeping frames [offset, offset + n_core).
+
+    Frames missing at the end of the input (or a block the tracker cannot
+    handle) are returned unvoiced, so the result always has n_core frames.
+    """
+    timer = timer or StageTimer()
+    with timer.stage("resample"):
+        y = resample(y_native, sr_native, sr, opts["res_type"])
+    f0 = np.full(n_core, np.nan)
+    voiced_flag = np.zeros(n_core, dtype=bool)
+    try:
+        with timer.stage("pitch"):
+            blk_f0, blk_voiced = _track_pitch(y, sr, opts)
+        blk_f0 = blk_f0[offset:offset + n_core]
+        f0[:len(blk_f0)] = blk_f0
+        voiced_flag[:len(blk_f0)] = blk_voiced[offset:offset + n_core]
+    except Exception:
+        # too short or unusable block: leave it unvoiced
+        pass
+    return f0, voiced_flag
+
+def _block_frames(sr: int, opts: dict):
+    # (frames per block, context frames on each side) on the analysis-rate hop grid
+    hop_length = opts["hop_length"]
+    step_frames = max(1, int(round(opts["block_seconds"] * sr / hop_length)))
+    pad_frames = min(step_frames, max(1, int(round(opts["overlap_seconds"] * sr / hop_length))))
+    return step_frames, pad_frames
+
+def iter_block_pitch(snd: sf.SoundFile, opts: dict, timer: StageTimer = None):
+    """Pitch-track ``snd`` in overlapping blocks, reading it sequentially.
+
+    ``opts`` are the processing parameters (see processing_params). Yields
+    ``(f0, voiced_flag, first_frame, sr)`` for consecutive, non-overlapping
+    ranges of the global frame grid (``first_frame * hop_length / sr``
+    seconds, ``sr`` being the analysis rate). Each block is decoded, downmixed
+    and resampled on its own with ``overlap_seconds`` of context on both
+    sides; the frames computed from that context are discarded, so memory
+    depends on the block size only.
+    """
+    timer = timer or StageTimer()
+    hop_length = opts["hop_length"]
+    sr_native = snd.samplerate
+    sr = analysis_rate(sr_native, opts["sr_target"], opts["decimate_native"])
+    ratio = sr_native / sr
+    total_target = int(np.ceil(snd.frames / ratio))
+    total_frames = 1 + total_target // hop_length
+    step_frames, pad_frames = _block_frames(sr, opts)
+
+    buf = np.empty(0, dtype=np.float32)
+    buf_start = 0  # native sample index of buf[0]
+    first_frame = 0
+    while first_frame < total_frames:
+        n_core = min(step_frames, total_frames - first_frame)
+        # block window on the analysis-rate grid, aligned to hop_length
+        win_start_t = max(0, first_frame - pad_frames) * hop_length
+        win_end_t = (first_frame + n_core + pad_frames) * hop_length
+        win_start = int(round(win_start_t * ratio))
+        win_end = min(snd.frames, int(round(win_end_t * ratio)))
+
+        # drop samples no later block needs, then read up to the end of the window
+        if win_start > buf_start:
+            buf = buf[win_start - buf_start:]
+            buf_start = win_start
+        need = win_end - (buf_start + len(buf))
+        if need > 0:
+            with timer.stage("decode"):
+                chunk = _to_mono(snd.read(need, dtype='float32'))
+            buf = np.concatenate((buf, chunk))
+        f0, voiced_flag = pitch_block(buf[:win_end - buf_start], sr_native, sr,
+                                      first_frame - win_start_t // hop_length, n_core, opts, timer)
+        yield f0, voiced_flag, first_frame, sr
+        first_frame += n_core
+
+class StreamingTranscriber:
+    """Incremental transcription of a live mono PCM stream of unknown length.
+
+    Same block scheme as iter_block_pitch, but driven by pushed samples:
+    ``add()`` buffers audio, ``next_block()`` hands out the next block window
+    once its right-hand context has arrived, and ``accept()`` turns that
+    block's pitch track (from pitch_block, possibly computed in another
+    process) into the note events that became final. Only the samples still
+    needed by future blocks are kept, so memory is bounded by the block size.
+    Latency is about ``block_seconds + overlap_seconds`` plus compute time.
+    """
+
+    def __init__(self, sr_native: int, opts: dict):
+        self.opts = opts
+        self.sr_native = sr_native
+        self.sr = analysis_rate(sr_native, opts["sr_target"], opts["decimate_native"])
+        self.ratio = sr_native / self.sr
+        self.hop_length = opts["hop_length"]
+        self.step_frames, self.pad_frames = _block_frames(self.sr, opts)
+        self.segmenter = NoteSegmenter(self.hop_length / self.sr)
+        self._buf = np.empty(0, dtype=np.float32)
+        self._buf_start = 0  # native sample index of _buf[0]
+        self._received = 0
+        self._next_frame = 0
+        self._finished = False
+
+    def add(self, samples: np.ndarray) -> None:
+        samples = np.asarray(samples, dtype=np.float32)
+        self._buf = np.concatenate((self._buf, samples))
+        self._received += len(samples)
+
+    def finish(self) -> None:
+        """Mark the end of the stream; next_block() then also returns the short tail blocks."""
+        self._finished = True
+
+    @property
+    def duration(self) -> float:
+        return self._received / self.sr_native
+
+    def next_block(self):
+        """Return ``(window, offset, n_core, first_frame)`` for the next ready block, or None."""
+        if self._finished:
+            total_frames = 1 + int(np.ceil(self._received / self.ratio)) // self.hop_length
+            if self._next_frame >= total_frames:
+                return None
+            n_core = min(self.step_frames, total_frames - self._next_frame)
+        else:
+            n_core = self.step_frames
+        first_frame = self._next_frame
+        win_start_t = max(0, first_frame - self.pad_frames) * self.hop_length
+        win_end_t = (first_frame + n_core + self.pad_frames) * self.hop_length
+        win_start = int(round(win_start_t * self.ratio))
+        win_end = int(round(win_end_t * self.ratio))
+        if not self._finished and win_end > self._received:
+            return None
+        win_end = min(win_end, self._received)
+        window = self._buf[win_start - self._buf_start:win_end - self._buf_start]
+        self._next_frame += n_core
+        # samples before the next block's window are no longer needed
+        keep_from = int(round(max(0, self._next_frame - self.pad_frames) * self.hop_length * self.ratio))
+        if keep_from > self._buf_start:
+            self._buf = self._buf[keep_from - self._buf_start:]
+            self._buf_start = keep_from
+        return window, first_frame - win_start_t // self.hop_length, n_core, first_frame
+
+    def accept(self, f0: np.ndarray, voiced_flag: np.ndarray, first_frame: int) -> List[Tuple[str, float, float]]:
+        """Consume the pitch track of a block from next_block(); blocks must be accepted in order."""
+        times = librosa.frames_to_time(np.arange(first_frame, first_frame + len(f0)),
+                                       sr=self.sr, hop_length=self.hop_length)
+        return self.segmenter.feed(quantize_pitch(f0, voiced_flag), times)
+
+    def flush(self) -> List[Tuple[str, float, float]]:
+        return self.segmenter.flush()
+
+# WAV encodings that can be viewed in place: (format tag, bits) -> (dtype, scale to [-1, 1])
+_WAV_MEMMAP_FORMATS = {
+    (1, 16): ('<i2', 1.0 / 32768),
+    (1, 32): ('<i4', 1.0 / 2147483648),
+    (3, 32): ('<f4', 1.0),
+}
+
+def _wav_memmap(path: str):
+    """Return (samples memmap of shape (frames, channels), scale, sr) for plain PCM/float WAV, else None."""
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(12)
+            if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+                return None
+            fmt = None
+            while True:
+                chunk = f.read(8)
+                if len(chunk) < 8:
+                    return None
+                chunk_id, size = chunk[:4], struct.unpack('<I', chunk[4:])[0]
+                if chunk_id == b'fmt ':
+                    body = f.read(size)
+                    tag, channels, sr = struct.unpack('<HHI', body[:8])
+                    bits = struct.unpack('<H', body[14:16])[0]
+                    if tag == 0xFFFE and len(body) >= 26:
+                        # WAVE_FORMAT_EXTENSIBLE: real format is the first field of the subformat GUID
+                        tag = struct.unpack('<H', body[24:26])[0]
+                    fmt = (tag, bits, channels, sr)
+                    if size % 2:
+                        f.seek(1, os.SEEK_CUR)
+                elif chunk_id == b'data':
+                    if fmt is None or (fmt[0], fmt[1]) not in _WAV_MEMMAP_FORMATS:
+                        return None
+                    dtype, scale = _WAV_MEMMAP_FORMATS[(fmt[0], fmt[1])]
+                    offset = f.tell()
+                    break
+                else:
+                    f.seek(size + (size % 2), os.SEEK_CUR)
+        channels, sr = fmt[2], fmt[3]
+        frame_bytes = np.dtype(dtype).itemsize * channels
+        frames = min(size, os.path.getsize(path) - offset) // frame_bytes
+        if channels == 0 or frames == 0:
+            return None
+        data = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(frames, channels))
+        return data, scale, sr
+    except (OSError, struct.error, ValueError):
+        return None
+
+def read_audio_mono(path: str):
+    """Decode ``path`` to a float32 mono signal; plain WAV is downmixed straight from a memory map."""
+    mapped = _wav_memmap(path)
+    if mapped is not None:
+        data, scale, sr = mapped
+        if data.shape[1] == 1:
+            y = data[:, 0].astype(np.float32)
+        else:
+            y = data.mean(axis=1, dtype=np.float32)
+        if scale != 1.0:
+            y *= np.float32(scale)
+        return y, sr
+    y, sr = sf.read(path, dtype='float32')
+    return _to_mono(y), sr
+
+def extract_notes_from_audio_file(path: str, sr_target=22050,
+                                  fmin=65.41, fmax=1975.53,
+                                  hop_length=512, frame_length=2048,
+                                  block_seconds=0, overlap_seconds=2.0,
+                                  engine=DEFAULT_ENGINE, res_type=DEFAULT_RES_TYPE,
+                                  decimate_native=False, silence_db=None,
+                                  max_seconds=0) -> Tuple[List[Tuple[str,float,float]], pretty_midi.PrettyMIDI]:
+    """Return events list and PrettyMIDI object for the audio file at ``path``.
+    events: list of (note_name, t_start, t_end)
+
+    With ``block_seconds > 0`` recordings longer than one block are processed
+    in windowed mode (see iter_block_pitch) so peak memory stays constant in
+    the input length; shorter inputs take the whole-signal path.
+    ``engine`` selects the pitch tracker (see PITCH_ENGINES); ``res_type`` and
+    ``decimate_native`` control resampling (see analysis_rate, QUALITY_TIERS).
+    With ``silence_db`` set, stretches quieter than that many dBFS are not
+    pitch-tracked at all (see active_regions). ``max_seconds > 0`` analyses
+    only the beginning of the recording (previews).
+    """
+    opts = dict(sr_target=sr_target, fmin=fmin, fmax=fmax, hop_length=hop_length,
+                frame_length=frame_length, block_seconds=block_seconds,
+                overlap_seconds=overlap_seconds, engine=engine, res_type=res_type,
+                decimate_native=decimate_native, silence_db=silence_db,
+                max_seconds=max_seconds)
+    events = _extract_events(path, opts)
+    if events is None:
+        return [], None
+    return events, build_midi(events)
+
+def extract_events_from_audio_file(path: str, **params) -> List[Tuple[str, float, float]]:
+    """Events only, without building a PrettyMIDI object.
+
+    Takes the keyword parameters of extract_notes_from_audio_file; this is the
+    cheap entry point for worker processes, whose results get pickled back.
+    """
+    return _extract_events(path, processing_params(**params)) or []
+
+def extract_events_timed(path: str, **params):
+    """Like extract_events_from_audio_file, also returning StageTimer.as_dict()
+    (audio duration and per-stage seconds) for the service metrics."""
+    timer = StageTimer()
+    events = _extract_events(path, processing_params(**params), timer)
+    return events or [], timer.as_dict()
+
+def extract_notes_from_audio_bytes(wav_bytes: bytes, sr_target=22050,
+                                     fmin=65.41, fmax=1975.53,
+                                     hop_length=512, frame_length=2048,
+                                     block_seconds=0, overlap_seconds=2.0,
+                                     engine=DEFAULT_ENGINE, res_type=DEFAULT_RES_TYPE,
+                                     decimate_native=False, silence_db=None,
+                                     max_seconds=0) -> Tuple[List[Tuple[str,float,float]], pretty_midi.PrettyMIDI]:
+    """Return events list and PrettyMIDI object.
+    events: list of (note_name, t_start, t_end)
+
+    In-memory counterpart of extract_notes_from_audio_file.
+    """
+    opts = dict(sr_target=sr_target, fmin=fmin, fmax=fmax, hop_length=hop_length,
+                frame_length=frame_length, block_seconds=block_seconds,
+                overlap_seconds=overlap_seconds, engine=engine, res_type=res_type,
+                decimate_native=decimate_native, silence_db=silence_db,
+                max_seconds=max_seconds)
+    events = _extract_events(io.BytesIO(wav_bytes), opts)
+    if events is None:
+        return [], None
+    return events, build_midi(events)
+
+def _extract_events(source, opts, timer: StageTimer = None):
+    """Events for a file path or file-like object; None when pitch tracking failed."""
+    get_pitch_engine(opts["engine"])
+    timer = timer or StageTimer()
+    max_seconds = opts.get("max_seconds") or 0
+    if max_seconds > 0:
+        # only the head of the recording: short by definition, so no windowed mode
+        with timer.stage("decode"):
+            with sf.SoundFile(source) as snd:
+                sr = snd.samplerate
+                y = _to_mono(snd.read(int(max_seconds * sr), dtype='float32'))
+        timer.audio_seconds = len(y) / sr
+        return _extract_events_from_signal(y, sr, opts, timer)
+    block_seconds = opts["block_seconds"]
+    if block_seconds and block_seconds > 0:
+        with sf.SoundFile(source) as snd:
+            if snd.frames > block_seconds * snd.samplerate:
+                timer.audio_seconds = snd.frames / snd.samplerate
+                return _extract_events_blockwise(snd, opts, timer)
+        if not isinstance(source, str):
+            source.seek(0)
+
+    with timer.stage("decode"):
+        if isinstance(source, str):
+            y, sr = read_audio_mono(source)
+        else:
+            y, sr = sf.read(source, dtype='float32')
+            # to mono
+            y = _to_mono(y)
+    timer.audio_seconds = len(y) / sr
+    return _extract_events_from_signal(y, sr, opts, timer)
+
+def _extract_events_from_signal(y, sr_native, opts, timer: StageTimer):
+    sr = analysis_rate(sr_native, opts["sr_target"], opts["decimate_native"])
+    with timer.stage("resample"):
+        y = resample(y, sr_native, sr, opts["res_type"])
+    hop_length = opts["hop_length"]
+
+    try:
+        with timer.stage("pitch"):
+            f0, voiced_flag = _track_pitch(y, sr, opts)
+        times = librosa.frames_to_time(np.arange(len(f0)), sr=sr, hop_length=hop_length)
+    except Exception:
+        # if pyin fails (very short audio or unsupported), return empty results
+        return None
+
+    with timer.stage("segment"):
+        midi_notes = quantize_pitch(f0, voiced_flag)
+        return segment_notes(midi_notes, times, hop_length / sr)
+
+def _extract_events_blockwise(snd, opts, timer: StageTimer):
+    hop_length = opts["hop_length"]
+    segmenter = None
+    events = []
+    for f0, voiced_flag, first_frame, sr in iter_block_pitch(snd, opts, timer):
+        with timer.stage("segment"):
+            if segmenter is None:
+                segmenter = NoteSegmenter(hop_length / sr)
+            times = librosa.frames_to_time(np.arange(first_frame, first_frame + len(f0)),
+                                           sr=sr, hop_length=hop_length)
+            events.extend(segmenter.feed(quantize_pitch(f0, voiced_flag), times))
+    if segmenter is not None:
+        events.extend(segmenter.flush())
+    return events
+
+
+def warm_up(seconds: float = 1.0, **params) -> int:
+    """Run a short synthetic melody through the pipeline.
+
+    Loads librosa/pretty_midi and triggers numba compilation (or loads it from
+    NUMBA_CACHE_DIR) so the first real request does not pay for it. Returns the
+    number of events found.
+    """
+    sr = 22050
+    t = np.arange(int(seconds * sr)) / sr
+    freqs = np.where(t < seconds / 2, 440.0, 660.0)
+    y = (0.3 * np.sin(2 * np.pi * freqs * t)).astype(np.float32)
+    bio = io.BytesIO()
+    sf.write(bio, y, sr, format='WAV')
+    events, _ = extract_notes_from_audio_bytes(bio.getvalue(), **params)
+    return len(events)
+
+
+def warm_up_worker(*param_sets) -> None:
+    """Process pool initializer: warm_up() for every parameter set, never raising.
+
+    Lives here rather than in main.py: spawned workers import the module of
+    their initializer, and main.py would rebuild the whole service in each.
+    """
+    try:
+        for params in param_sets:
+            warm_up(**params)
+    except Exception:
+        logging.getLogger("mutrapro").exception("Worker warm-up failed")
+
 
-    return events, pm
+def processing_params(**overrides) -> dict:
+    """Effective keyword parameters of extract_notes_from_audio_bytes (defaults + overrides)."""
+    sig = inspect.signature(extract_notes_from_audio_bytes)
+    params = {name: p.default for name, p in sig.parameters.items()
+              if p.default is not inspect.Parameter.empty}
+    unknown = set(overrides) - set(params)
+    if unknown:
+        raise TypeError(f"Unknown processing parameters: {', '.join(sorted(unknown))}")
+    params.update(overrides)
+    return params
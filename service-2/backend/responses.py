@@ -0,0 +1,114 @@
+import json
+
+import numpy as np
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse, Response
+
+from midi import note_name_to_number
+
+# optional speedups: orjson for the default JSON path, msgpack for the binary format
+try:
+    import orjson
+except ImportError:  # pragma: no cover - falls back to the stdlib encoder
+    orjson = None
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - binary responses become unavailable (406)
+    msgpack = None
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+# dtypes of the columnar event arrays (little-endian, as sent on the wire)
+COLUMN_DTYPES = {"pitch": "u1", "start": "<f4", "end": "<f4"}
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when available (several times faster on large event lists)."""
+
+    def render(self, content) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class MsgpackResponse(Response):
+    media_type = "application/msgpack"
+
+    def render(self, content) -> bytes:
+        return msgpack.packb(content, use_bin_type=True)
+
+
+def build_transcription_text(events) -> str:
+    # build transcription_text (durations)
+    text_parts = []
+    for e in events:
+        dur = e["end"] - e["start"]
+        text_parts.append(f"{e['note']}({dur:.3f}s)")
+    return " ".join(text_parts)
+
+
+def events_to_columns(events) -> dict:
+    """Pack normalized events into columnar arrays for the binary response.
+
+    Returns ``{"count": n, "dtype": COLUMN_DTYPES, "pitch": bytes, "start": bytes,
+    "end": bytes}``: MIDI note numbers as uint8 and start/end seconds as float32,
+    each a raw little-endian buffer (``np.frombuffer(col, dtype)`` on the client).
+    Events whose note name cannot be parsed are left out.
+    """
+    rows = []
+    for e in events:
+        try:
+            rows.append((note_name_to_number(e["note"]), e["start"], e["end"]))
+        except ValueError:
+            continue
+    pitch = np.fromiter((r[0] for r in rows), dtype=COLUMN_DTYPES["pitch"], count=len(rows))
+    start = np.fromiter((r[1] for r in rows), dtype=COLUMN_DTYPES["start"], count=len(rows))
+    end = np.fromiter((r[2] for r in rows), dtype=COLUMN_DTYPES["end"], count=len(rows))
+    return {
+        "count": len(rows),
+        "dtype": COLUMN_DTYPES,
+        "pitch": pitch.tobytes(),
+        "start": start.tobytes(),
+        "end": end.tobytes(),
+    }
+
+
+def wants_msgpack(accept) -> bool:
+    """True when the Accept header asks for msgpack (q=0 entries are ignored)."""
+    for part in (accept or "").split(","):
+        media_type, *params = [p.strip() for p in part.split(";")]
+        if media_type.lower() not in MSGPACK_MEDIA_TYPES:
+            continue
+        q = next((p[2:] for p in params if p.startswith("q=")), "1")
+        try:
+            if float(q) > 0:
+                return True
+        except ValueError:
+            return True
+    return False
+
+
+def check_accept(accept) -> None:
+    """406 when the client asks for msgpack and this server cannot produce it."""
+    if wants_msgpack(accept) and msgpack is None:
+        raise HTTPException(status_code=406, detail="msgpack responses are not available on this server")
+
+
+def render_result(payload: dict, accept=None, include_text: bool = True) -> Response:
+    """Encode a transcription payload (``events`` + ``midi_file`` ...) for the client.
+
+    JSON by default; msgpack with columnar events when the Accept header asks
+    for it. ``transcription_text`` is derived from the events here and only
+    when ``include_text`` is set.
+    """
+    payload = dict(payload)
+    payload.pop("transcription_text", None)
+    events = payload.get("events")
+    if events is not None and include_text:
+        payload["transcription_text"] = build_transcription_text(events)
+    if wants_msgpack(accept):
+        check_accept(accept)
+        if events is not None:
+            payload["events"] = events_to_columns(events)
+        return MsgpackResponse(payload)
+    return FastJSONResponse(payload)
@@ -0,0 +1,113 @@
+import logging
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from processing import pitch_block
+
+logger = logging.getLogger("mutrapro")
+
+# Decoded audio handed to the process pool through shared memory instead of pickling:
+# the service copies samples once into a SharedAudio block and submits only its
+# ``ref`` (name, shape, dtype); workers map the same pages via attach().
+
+_live = {}  # shared memory name -> bytes, blocks created by this process and not yet released
+_live_lock = threading.Lock()
+
+
+class SharedAudio:
+    """Owner of a shared-memory block of samples; ``array`` is a NumPy view of it.
+
+    Use it as a context manager (or call release()) so the block is unlinked
+    as soon as the work using it finished, failed or was cancelled. Workers
+    that still have it mapped keep their mapping until they detach.
+    """
+
+    def __init__(self, shape, dtype=np.float32):
+        dtype = np.dtype(dtype)
+        shape = tuple(int(n) for n in np.atleast_1d(shape))
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        # zero-sized blocks are not allowed
+        self._shm = shared_memory.SharedMemory(create=True, size=max(1, nbytes))
+        self.array = np.ndarray(shape, dtype=dtype, buffer=self._shm.buf)
+        self.ref = (self._shm.name, shape, dtype.str)
+        with _live_lock:
+            _live[self._shm.name] = nbytes
+
+    @classmethod
+    def from_array(cls, y: np.ndarray, dtype=np.float32) -> "SharedAudio":
+        block = cls(y.shape, dtype)
+        block.array[...] = y
+        return block
+
+    @property
+    def nbytes(self) -> int:
+        return self.array.nbytes if self.array is not None else 0
+
+    def release(self) -> None:
+        """Unmap and unlink the block; safe to call more than once."""
+        if self._shm is None:
+            return
+        shm, self._shm = self._shm, None
+        self.array = None
+        with _live_lock:
+            _live.pop(shm.name, None)
+        try:
+            shm.close()
+        except BufferError:
+            # a view of the block is still referenced somewhere; it is unmapped when that goes away
+            logger.warning("Shared audio block %s still in use at release", shm.name)
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def __del__(self):
+        if getattr(self, "_shm", None) is not None:
+            self.release()
+
+
+def attach(ref):
+    """Map a SharedAudio block in a worker process; returns ``(handle, view)``.
+
+    The view is shared with the owner and other workers, so never write to
+    it, and drop every reference to it before passing the handle to detach().
+    Workers never unlink: the owning process does, and its resource tracker
+    (shared with spawned workers) cleans up if it dies first.
+    """
+    name, shape, dtype = ref
+    shm = shared_memory.SharedMemory(name=name)
+    # left writeable: numba (pYIN) compiles separate code for read-only arrays
+    view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    return shm, view
+
+
+def detach(shm) -> None:
+    try:
+        shm.close()
+    except BufferError:
+        # a view escaped (e.g. held by a traceback); the mapping goes away with it
+        logger.warning("Shared audio block %s still referenced in worker", shm.name)
+
+
+def stats() -> dict:
+    with _live_lock:
+        return {"blocks": len(_live), "bytes": sum(_live.values())}
+
+
+def pitch_block_shared(ref, sr_native: int, sr: int, offset: int, n_core: int, opts: dict):
+    """processing.pitch_block on a window passed as a SharedAudio ref (runs in a worker)."""
+    shm, window = attach(ref)
+    try:
+        return pitch_block(window, sr_native, sr, offset, n_core, opts)
+    finally:
+        del window
+        detach(shm)
+
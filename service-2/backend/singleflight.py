@@ -0,0 +1,46 @@
+import asyncio
+import logging
+
+logger = logging.getLogger("mutrapro")
+
+
+class SingleFlight:
+    """Coalesces concurrent identical calls into one execution.
+
+    ``do(key, fn)`` starts ``fn()`` (a coroutine function) unless a call with
+    the same key is already running, in which case it waits for that one and
+    shares its result or exception. The work runs in its own task, so a
+    caller that is cancelled does not take it down for the others.
+    """
+
+    def __init__(self):
+        self.executions = 0
+        self.coalesced = 0
+        self._calls = {}  # key -> running task
+
+    async def do(self, key, fn):
+        """Return ``(result, shared)``; ``shared`` is True when another call did the work."""
+        task = self._calls.get(key)
+        shared = task is not None
+        if shared:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            self.executions += 1
+            task.add_done_callback(lambda t: self._finished(key, t))
+        return await asyncio.shield(task), shared
+
+    def _finished(self, key, task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled() and task.exception() is not None:
+            # retrieved here so it is not reported as unhandled when every caller went away
+            logger.debug("Coalesced call %s failed: %r", key, task.exception())
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def stats(self) -> dict:
+        return {"in_flight": self.in_flight, "executions": self.executions, "coalesced": self.coalesced}
@@ -0,0 +1,238 @@
+import os
+import time
+import shutil
+import asyncio
+import logging
+import threading
+
+import soundfile as sf
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger("mutrapro")
+
+# files touched more recently than this are never evicted for quota (uploads still being written/processed)
+MIN_EVICT_AGE = 15 * 60
+# PCM subtypes FLAC holds losslessly; archived originals in other formats are moved unchanged
+_FLAC_ARCHIVE_SUBTYPES = {"PCM_16": "int16", "PCM_24": "int32"}
+
+
+def _dir_files(path: str, exclude=()):
+    """(path, size, mtime) of the regular files directly inside ``path``, oldest first."""
+    files = []
+    try:
+        entries = list(os.scandir(path))
+    except FileNotFoundError:
+        return files
+    for entry in entries:
+        if entry.name in exclude or not entry.is_file(follow_symlinks=False):
+            continue
+        try:
+            st = entry.stat(follow_symlinks=False)
+        except FileNotFoundError:
+            continue
+        files.append((entry.path, st.st_size, st.st_mtime))
+    files.sort(key=lambda f: f[2])
+    return files
+
+
+def _remove(path: str) -> bool:
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+class StorageManager:
+    """Lifecycle of the uploads and outputs directories.
+
+    Uploads are stored content-addressed (``<sha256><ext>``) so identical files
+    are kept once. A periodic sweep removes uploads older than
+    ``upload_max_age`` (or moves them to ``archive_dir``, re-encoding PCM
+    audio as FLAC, when ``archive`` is set), outputs older than
+    ``output_max_age``, and then the oldest files of any directory above its
+    byte quota. Ages are in seconds and quotas in bytes; 0 disables a limit.
+    ``protect()`` returns upload paths that must survive (queued jobs);
+    ``exclude`` are file names in the upload directory that are not uploads.
+    """
+
+    def __init__(self, upload_dir: str, output_dir: str, archive_dir: str,
+                 upload_max_age: float = 0, output_max_age: float = 0,
+                 upload_quota: int = 0, output_quota: int = 0,
+                 archive: bool = False, archive_quota: int = 0,
+                 protect=None, exclude=()):
+        self.upload_dir = upload_dir
+        self.output_dir = output_dir
+        self.archive_dir = archive_dir
+        self.upload_max_age = upload_max_age
+        self.output_max_age = output_max_age
+        self.upload_quota = upload_quota
+        self.output_quota = output_quota
+        self.archive = archive
+        self.archive_quota = archive_quota
+        self.protect = protect or (lambda: set())
+        self.exclude = set(exclude) | {os.path.basename(archive_dir)}
+        self.dedup_hits = 0
+        self.dedup_bytes_saved = 0
+        self.last_sweep = None
+        self._lock = threading.Lock()
+        self._task = None
+        if archive:
+            os.makedirs(archive_dir, exist_ok=True)
+
+    def adopt_upload(self, tmp_path: str, content_hash: str) -> str:
+        """Move a freshly written upload to its content-addressed name and return that path.
+
+        When the same content is already stored the new copy is dropped and the
+        existing file's mtime refreshed, so it counts as recently used.
+        """
+        ext = os.path.splitext(tmp_path)[1].lower()
+        path = os.path.join(self.upload_dir, f"{content_hash}{ext}")
+        with self._lock:
+            if os.path.isfile(path):
+                size = os.path.getsize(tmp_path)
+                os.remove(tmp_path)
+                os.utime(path)
+                self.dedup_hits += 1
+                self.dedup_bytes_saved += size
+                logger.info("Upload %s already stored as %s", os.path.basename(tmp_path), path)
+            else:
+                os.replace(tmp_path, path)
+        return path
+
+    def _archive_upload(self, path: str) -> int:
+        """Move ``path`` into the archive; returns the archived size in bytes."""
+        name = os.path.splitext(os.path.basename(path))[0]
+        try:
+            info = sf.info(path)
+        except (RuntimeError, sf.LibsndfileError):
+            info = None
+        if info is not None and info.format != "FLAC" and info.subtype in _FLAC_ARCHIVE_SUBTYPES:
+            dest = os.path.join(self.archive_dir, f"{name}.flac")
+            dtype = _FLAC_ARCHIVE_SUBTYPES[info.subtype]
+            with sf.SoundFile(path) as src, sf.SoundFile(dest + ".tmp", "w", samplerate=src.samplerate,
+                                                         channels=src.channels, format="FLAC",
+                                                         subtype=info.subtype) as dst:
+                for block in src.blocks(blocksize=1 << 16, dtype=dtype):
+                    dst.write(block)
+            os.replace(dest + ".tmp", dest)
+            os.remove(path)
+        else:
+            dest = os.path.join(self.archive_dir, os.path.basename(path))
+            shutil.move(path, dest)
+        return os.path.getsize(dest)
+
+    def _expire_upload(self, path: str, size: int, summary: dict) -> None:
+        with self._lock:
+            # re-check under the lock: adopt_upload() may have just reused this file
+            try:
+                if time.time() - os.path.getmtime(path) < self.upload_max_age:
+                    return
+            except FileNotFoundError:
+                return
+            if self.archive:
+                archived = self._archive_upload(path)
+                summary["uploads_archived"] += 1
+                summary["bytes_freed"] += size - archived
+            elif _remove(path):
+                summary["uploads_removed"] += 1
+                summary["bytes_freed"] += size
+
+    def _enforce_quota(self, files, quota: int, now: float, protected) -> tuple:
+        total = sum(size for _, size, _ in files)
+        removed = freed = 0
+        for path, size, _ in files:
+            if total <= quota:
+                break
+            try:
+                # current mtime: uploads reused since the listing count as fresh
+                if path in protected or now - os.path.getmtime(path) < MIN_EVICT_AGE:
+                    continue
+            except FileNotFoundError:
+                total -= size
+                continue
+            if _remove(path):
+                removed += 1
+                freed += size
+            total -= size
+        return removed, freed
+
+    def sweep(self) -> dict:
+        """One eviction/archival pass over all directories. Runs in a thread."""
+        now = time.time()
+        summary = {"time": now, "uploads_removed": 0, "uploads_archived": 0, "outputs_removed": 0,
+                   "archive_removed": 0, "bytes_freed": 0}
+        protected = set(self.protect())
+        kept = []
+        for path, size, mtime in _dir_files(self.upload_dir, self.exclude):
+            if path in protected or not self.upload_max_age or now - mtime < self.upload_max_age:
+                kept.append((path, size, mtime))
+                continue
+            try:
+                self._expire_upload(path, size, summary)
+            except (OSError, RuntimeError):
+                logger.exception("Failed to expire upload %s", path)
+        if self.upload_quota:
+            with self._lock:
+                removed, freed = self._enforce_quota(kept, self.upload_quota, now, protected)
+            summary["uploads_removed"] += removed
+            summary["bytes_freed"] += freed
+
+        outputs = _dir_files(self.output_dir)
+        kept = []
+        for path, size, mtime in outputs:
+            if self.output_max_age and now - mtime >= self.output_max_age:
+                if _remove(path):
+                    summary["outputs_removed"] += 1
+                    summary["bytes_freed"] += size
+            else:
+                kept.append((path, size, mtime))
+        if self.output_quota:
+            removed, freed = self._enforce_quota(kept, self.output_quota, now, ())
+            summary["outputs_removed"] += removed
+            summary["bytes_freed"] += freed
+
+        if self.archive and self.archive_quota:
+            removed, freed = self._enforce_quota(_dir_files(self.archive_dir), self.archive_quota, now, ())
+            summary["archive_removed"] += removed
+            summary["bytes_freed"] += freed
+
+        self.last_sweep = summary
+        if any(v for k, v in summary.items() if k != "time"):
+            logger.info("Storage sweep: %s", summary)
+        return summary
+
+    def stats(self) -> dict:
+        def usage(path, exclude=()):
+            files = _dir_files(path, exclude)
+            return {"files": len(files), "bytes": sum(size for _, size, _ in files)}
+
+        result = {
+            "uploads": dict(usage(self.upload_dir, self.exclude), max_age_seconds=self.upload_max_age,
+                            quota_bytes=self.upload_quota),
+            "outputs": dict(usage(self.output_dir), max_age_seconds=self.output_max_age,
+                            quota_bytes=self.output_quota),
+            "dedup": {"hits": self.dedup_hits, "bytes_saved": self.dedup_bytes_saved},
+            "last_sweep": self.last_sweep,
+        }
+        if self.archive:
+            result["archive"] = dict(usage(self.archive_dir), quota_bytes=self.archive_quota)
+        return result
+
+    def start(self, interval: float) -> None:
+        """Run sweep() every ``interval`` seconds in the background."""
+        self._task = asyncio.create_task(self._run(interval))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self, interval: float) -> None:
+        while True:
+            try:
+                await run_in_threadpool(self.sweep)
+            except Exception:
+                logger.exception("Storage sweep failed")
+            await asyncio.sleep(interval)
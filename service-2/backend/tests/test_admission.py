@@ -0,0 +1,155 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, Overloaded, FAST_LANE, LONG_LANE
+
+
+async def _settle():
+    # let woken waiters run
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+def test_fast_lane_slot_is_reserved_for_short_requests():
+    async def scenario():
+        admission = AdmissionController(2, max_queue=4, fast_seconds=30, fast_slots=1)
+        await admission.acquire(600)
+        assert not admission._can_run(LONG_LANE)
+        waiting_long = asyncio.ensure_future(admission.acquire(600))
+        await _settle()
+        assert not waiting_long.done()
+        # the reserved slot is still free for a short clip
+        await admission.acquire(10)
+        assert admission.active == {FAST_LANE: 1, LONG_LANE: 1}
+        admission.release(600)
+        await _settle()
+        assert waiting_long.done()
+        assert admission.lane_slots(10) == 2 and admission.lane_slots(600) == 1
+
+    asyncio.run(scenario())
+
+
+def test_waiting_fast_requests_go_first_then_shorter_long_ones():
+    async def scenario():
+        admission = AdmissionController(1, max_queue=10, fast_seconds=30)
+        order = []
+
+        async def request(audio):
+            async with admission.slot(audio, shed=False):
+                order.append(audio)
+                await asyncio.sleep(0)
+
+        await admission.acquire(600)
+        tasks = [asyncio.ensure_future(request(audio)) for audio in (900, 300, 10)]
+        await _settle()
+        admission.release(600)
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(scenario()) == [10, 300, 900]
+
+
+def test_blocks_of_a_long_recording_stay_in_the_long_lane():
+    async def scenario():
+        admission = AdmissionController(2, max_queue=4, fast_seconds=30, fast_slots=1)
+        # a 2 s block of a long stream: short, but not allowed into the reserved slot
+        await admission.acquire(2, shed=False, lane=LONG_LANE)
+        second_block = asyncio.ensure_future(admission.acquire(2, shed=False, lane=LONG_LANE))
+        await _settle()
+        assert not second_block.done()
+        async with admission.slot(5):
+            assert admission.active == {FAST_LANE: 1, LONG_LANE: 1}
+        admission.release(2, 0.5, LONG_LANE)
+        await _settle()
+        assert second_block.done() and admission.active == {FAST_LANE: 0, LONG_LANE: 1}
+        admission.release(2, None, LONG_LANE)
+        return admission
+
+    admission = asyncio.run(scenario())
+    assert sum(admission.active.values()) == 0
+
+
+def test_sheddable_requests_are_rejected_when_the_queue_is_full_but_durable_ones_wait():
+    async def scenario():
+        admission = AdmissionController(1, max_queue=1)
+        await admission.acquire(60)
+        queued = asyncio.ensure_future(admission.acquire(60))
+        await _settle()
+        with pytest.raises(Overloaded) as rejected:
+            await admission.acquire(60)
+        assert rejected.value.status_code == 429 and rejected.value.reason == "queue_full"
+        assert int(rejected.value.headers["Retry-After"]) >= 1
+        durable = asyncio.ensure_future(admission.acquire(60, shed=False))
+        await _settle()
+        assert admission.queued == 2 and admission.saturated
+        admission.release(60)
+        await _settle()
+        admission.release(60)
+        await _settle()
+        assert queued.done() and durable.done()
+        admission.release(60)
+        return admission.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["active"] == 0 and stats["queued"] == 0
+    assert stats["rejected"]["queue_full"] == 1 and stats["admitted"] == 3
+
+
+def test_queue_timeout_sheds_only_sheddable_requests():
+    async def scenario():
+        admission = AdmissionController(1, max_queue=4, queue_timeout=0.05)
+        await admission.acquire(60)
+        sheddable = asyncio.ensure_future(admission.acquire(60))
+        durable = asyncio.ensure_future(admission.acquire(60, shed=False))
+        await asyncio.sleep(0.1)
+        with pytest.raises(Overloaded) as timed_out:
+            await sheddable
+        assert timed_out.value.status_code == 503 and timed_out.value.reason == "timeout"
+        assert not durable.done()
+        admission.release(60)
+        await _settle()
+        assert durable.done()
+        admission.release(60)
+        return admission
+
+    admission = asyncio.run(scenario())
+    assert sum(admission.active.values()) == 0 and admission.queued == 0 and admission.queued_audio == 0
+
+
+def test_slot_handed_to_a_waiter_that_gives_up_is_passed_on():
+    async def scenario():
+        admission = AdmissionController(1, max_queue=4)
+        await admission.acquire(60)
+        leaving = asyncio.ensure_future(admission.acquire(60))
+        staying = asyncio.ensure_future(admission.acquire(60))
+        await _settle()
+        # the slot goes to `leaving`, which is cancelled before it could resume
+        admission.release(60)
+        leaving.cancel()
+        await _settle()
+        assert leaving.cancelled()
+        assert staying.done() and sum(admission.active.values()) == 1
+        admission.release(60)
+        return admission
+
+    admission = asyncio.run(scenario())
+    assert sum(admission.active.values()) == 0 and admission.queued == 0
+
+
+def test_queued_audio_limit():
+    async def scenario():
+        admission = AdmissionController(1, max_queue=10, max_queued_audio=100)
+        await admission.acquire(60)
+        waiting = asyncio.ensure_future(admission.acquire(80))
+        await _settle()
+        with pytest.raises(Overloaded) as rejected:
+            admission.check(30)
+        assert rejected.value.reason == "audio_limit"
+        admission.check(10)
+        waiting.cancel()
+        await _settle()
+        return admission
+
+    admission = asyncio.run(scenario())
+    assert admission.queued == 0 and admission.queued_audio == 0
@@ -0,0 +1,76 @@
+import os
+
+from cache import ResultCache, make_key
+
+EVENTS = [{"note": "C4", "start": 0.0, "end": 0.5}]
+
+
+def _entry_size(cache_dir):
+    probe = ResultCache(str(cache_dir / "probe"), 1 << 20)
+    probe.put("k", EVENTS)
+    return probe.stats()["bytes"]
+
+
+def test_get_returns_stored_events_and_midi(tmp_path):
+    midi = tmp_path / "song.mid"
+    midi.write_bytes(b"MThd")
+    cache = ResultCache(str(tmp_path / "cache"), 1 << 20)
+    key = make_key("abc", {"fmin": 65.0})
+
+    assert cache.get(key) is None
+    cache.put(key, EVENTS, str(midi))
+    events, midi_path = cache.get(key)
+
+    assert events == EVENTS
+    with open(midi_path, "rb") as f:
+        assert f.read() == b"MThd"
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+    assert not [name for name in os.listdir(cache.cache_dir) if name.endswith(".tmp")]
+
+
+def test_least_recently_used_entry_is_evicted_first(tmp_path):
+    size = _entry_size(tmp_path)
+    cache = ResultCache(str(tmp_path / "cache"), 2 * size)
+    cache.put("a", EVENTS)
+    cache.put("b", EVENTS)
+    # reading "a" makes "b" the least recently used
+    assert cache.get("a") is not None
+
+    cache.put("c", EVENTS)
+
+    assert cache.contains("a") and cache.contains("c") and not cache.contains("b")
+    assert not os.path.exists(os.path.join(cache.cache_dir, "b.json"))
+    assert cache.stats()["evictions"] == 1 and cache.stats()["bytes"] == 2 * size
+
+
+def test_reload_keeps_recency_order_and_quota(tmp_path):
+    size = _entry_size(tmp_path)
+    cache_dir = str(tmp_path / "cache")
+    cache = ResultCache(cache_dir, 3 * size)
+    for key in ("a", "b", "c"):
+        cache.put(key, EVENTS)
+    for key, stamp in (("a", 300), ("b", 100), ("c", 200)):
+        os.utime(os.path.join(cache_dir, f"{key}.json"), (stamp, stamp))
+
+    # a smaller quota on restart evicts by the mtimes left on disk
+    reloaded = ResultCache(cache_dir, 2 * size)
+
+    assert not reloaded.contains("b")
+    assert reloaded.get("a")[0] == EVENTS and reloaded.get("c")[0] == EVENTS
+
+
+def test_entry_removed_from_disk_is_a_miss(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), 1 << 20)
+    cache.put("a", EVENTS)
+    os.remove(os.path.join(cache.cache_dir, "a.json"))
+
+    assert cache.get("a") is None
+    assert not cache.contains("a") and cache.stats()["bytes"] == 0
+
+
+def test_disabled_cache_stores_nothing(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), 0)
+    cache.put("a", EVENTS)
+
+    assert not cache.enabled and cache.get("a") is None and not cache.contains("a")
+    assert not os.path.exists(cache.cache_dir)
@@ -0,0 +1,26 @@
+import io
+
+import pretty_midi
+import pytest
+
+from midi import events_to_midi_bytes, note_name_to_number
+
+
+def test_note_names():
+    assert note_name_to_number("C4") == 60
+    assert note_name_to_number("A4") == 69
+    assert note_name_to_number("C#-1") == 1
+    assert note_name_to_number("Bb3") == 58
+    with pytest.raises(ValueError):
+        note_name_to_number("H2")
+
+
+def test_events_round_trip_through_a_midi_reader():
+    events = [{"note": "A4", "start": 0.0, "end": 0.5}, ("C4", 0.5, 1.25), ("E4", 0.5, 1.0),
+              {"note": "A4", "start": 1.25, "end": 2.0}, ("not-a-note", 0.0, 1.0)]
+    midi = pretty_midi.PrettyMIDI(io.BytesIO(events_to_midi_bytes(events, velocity=90)))
+    notes = sorted(midi.instruments[0].notes, key=lambda n: (n.start, n.pitch))
+    assert [(n.pitch, round(n.start, 2), round(n.end, 2)) for n in notes] == [
+        (69, 0.0, 0.5), (60, 0.5, 1.25), (64, 0.5, 1.0), (69, 1.25, 2.0)]
+    assert all(n.velocity == 90 for n in notes)
+    assert midi.get_tempo_changes()[1][0] == pytest.approx(120.0)
@@ -0,0 +1,40 @@
+import numpy as np
+
+from processing import NoteSegmenter, segment_notes
+
+
+def _frames(seed: int, n: int = 400):
+    # quantized pitch frames: runs of notes with unvoiced (NaN) gaps
+    rng = np.random.default_rng(seed)
+    notes = []
+    while len(notes) < n:
+        value = np.nan if rng.random() < 0.3 else float(rng.integers(48, 72))
+        notes.extend([value] * int(rng.integers(1, 12)))
+    return np.array(notes[:n])
+
+
+def test_any_chunking_gives_the_events_of_segment_notes():
+    frame_duration = 512 / 22050
+    for seed in range(20):
+        midi_notes = _frames(seed)
+        times = np.arange(len(midi_notes)) * frame_duration
+        expected = segment_notes(midi_notes, times, frame_duration)
+        rng = np.random.default_rng(1000 + seed)
+        n = len(midi_notes)
+        splits = [list(range(1, n)), list(range(7, n, 7)), list(range(64, n, 64)), [],
+                  sorted(set(rng.integers(1, n, 25).tolist()))]
+        for cuts in splits:
+            segmenter = NoteSegmenter(frame_duration)
+            events = []
+            for part_notes, part_times in zip(np.split(midi_notes, cuts), np.split(times, cuts)):
+                events.extend(segmenter.feed(part_notes, part_times))
+            events.extend(segmenter.flush())
+            assert events == expected, (seed, cuts[:5])
+
+
+def test_empty_and_silent_chunks():
+    segmenter = NoteSegmenter(0.01)
+    assert segmenter.feed(np.array([]), np.array([])) == []
+    assert segmenter.feed(np.array([60.0, 60.0]), np.array([0.0, 0.01])) == []
+    assert segmenter.feed(np.array([np.nan]), np.array([0.02])) == [("C4", 0.0, 0.02)]
+    assert segmenter.flush() == []
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_identical_calls_share_one_execution():
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(flight.do("k", work) for _ in range(3)))
+        return flight, calls, results
+
+    flight, calls, results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert [r for r, _ in results] == ["result"] * 3
+    assert [shared for _, shared in results] == [False, True, True]
+    assert flight.stats() == {"in_flight": 0, "executions": 1, "coalesced": 2}
+
+
+def test_different_keys_and_later_calls_run_again():
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+
+        async def work(key):
+            calls.append(key)
+            await asyncio.sleep(0)
+            return key
+
+        await asyncio.gather(flight.do("a", lambda: work("a")), flight.do("b", lambda: work("b")))
+        await flight.do("a", lambda: work("a"))
+        return calls
+
+    assert sorted(asyncio.run(scenario())) == ["a", "a", "b"]
+
+
+def test_exception_is_shared_by_every_caller():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        return flight, await asyncio.gather(flight.do("k", work), flight.do("k", work), return_exceptions=True)
+
+    flight, results = asyncio.run(scenario())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert flight.in_flight == 0
+
+
+def test_cancelled_caller_does_not_cancel_the_work():
+    async def scenario():
+        flight = SingleFlight()
+        done = asyncio.Event()
+
+        async def work():
+            await done.wait()
+            return 42
+
+        first = asyncio.ensure_future(flight.do("k", work))
+        second = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        done.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == (42, True)
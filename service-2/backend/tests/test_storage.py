@@ -0,0 +1,92 @@
+import os
+import time
+
+from storage import StorageManager, MIN_EVICT_AGE
+
+
+def _file(path, size, age):
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+    return path
+
+
+def _manager(tmp_path, **kwargs):
+    uploads, outputs = tmp_path / "uploads", tmp_path / "outputs"
+    uploads.mkdir()
+    outputs.mkdir()
+    return StorageManager(str(uploads), str(outputs), str(uploads / "archive"), **kwargs)
+
+
+def test_sweep_expires_old_uploads_and_outputs_but_keeps_protected_and_excluded(tmp_path):
+    protected = set()
+    storage = _manager(tmp_path, upload_max_age=3600, output_max_age=600,
+                       protect=lambda: protected, exclude=("jobs.sqlite3",))
+    old = _file(os.path.join(storage.upload_dir, "old.wav"), 10, 7200)
+    fresh = _file(os.path.join(storage.upload_dir, "fresh.wav"), 10, 60)
+    queued = _file(os.path.join(storage.upload_dir, "queued.wav"), 10, 7200)
+    database = _file(os.path.join(storage.upload_dir, "jobs.sqlite3"), 10, 7200)
+    stale_midi = _file(os.path.join(storage.output_dir, "a.mid"), 20, 1200)
+    new_midi = _file(os.path.join(storage.output_dir, "b.mid"), 20, 10)
+    protected.add(queued)
+
+    summary = storage.sweep()
+
+    assert not os.path.exists(old) and not os.path.exists(stale_midi)
+    assert all(os.path.exists(p) for p in (fresh, queued, database, new_midi))
+    assert summary["uploads_removed"] == 1 and summary["outputs_removed"] == 1
+    assert summary["bytes_freed"] == 30
+    assert storage.last_sweep is summary
+
+
+def test_quota_evicts_oldest_first_and_spares_recent_files(tmp_path):
+    storage = _manager(tmp_path, output_quota=250)
+    oldest = _file(os.path.join(storage.output_dir, "1.mid"), 100, MIN_EVICT_AGE + 300)
+    older = _file(os.path.join(storage.output_dir, "2.mid"), 100, MIN_EVICT_AGE + 200)
+    old = _file(os.path.join(storage.output_dir, "3.mid"), 100, MIN_EVICT_AGE + 100)
+    # over quota on its own, but too recent to evict
+    recent = _file(os.path.join(storage.output_dir, "4.mid"), 100, 60)
+
+    summary = storage.sweep()
+
+    # 400 bytes against a 250 quota: the two oldest go, the rest stay
+    assert not os.path.exists(oldest) and not os.path.exists(older)
+    assert os.path.exists(old) and os.path.exists(recent)
+    assert summary["outputs_removed"] == 2 and summary["bytes_freed"] == 200
+
+
+def test_upload_quota_skips_protected_uploads(tmp_path):
+    protected = set()
+    storage = _manager(tmp_path, upload_quota=100, protect=lambda: protected)
+    queued = _file(os.path.join(storage.upload_dir, "queued.wav"), 100, MIN_EVICT_AGE + 200)
+    other = _file(os.path.join(storage.upload_dir, "other.wav"), 100, MIN_EVICT_AGE + 100)
+    protected.add(queued)
+
+    storage.sweep()
+
+    assert os.path.exists(queued) and not os.path.exists(other)
+
+
+def test_disabled_limits_keep_everything(tmp_path):
+    storage = _manager(tmp_path)
+    kept = [_file(os.path.join(storage.upload_dir, "a.wav"), 10, 10 ** 6),
+            _file(os.path.join(storage.output_dir, "a.mid"), 10, 10 ** 6)]
+
+    summary = storage.sweep()
+
+    assert all(os.path.exists(p) for p in kept)
+    assert summary["bytes_freed"] == 0
+
+
+def test_adopt_upload_deduplicates_identical_content(tmp_path):
+    storage = _manager(tmp_path)
+    first = _file(os.path.join(storage.upload_dir, "tmp1.WAV"), 10, 7200)
+    path = storage.adopt_upload(first, "abc")
+    second = _file(os.path.join(storage.upload_dir, "tmp2.wav"), 10, 0)
+
+    assert storage.adopt_upload(second, "abc") == path == os.path.join(storage.upload_dir, "abc.wav")
+    assert not os.path.exists(second)
+    # the reused file counts as recently used again
+    assert time.time() - os.path.getmtime(path) < 60
+    assert storage.dedup_hits == 1 and storage.dedup_bytes_saved == 10